@@ -0,0 +1,37 @@
+import os
+import pty
+import sys
+import time
+import click
+
+def process_cpu_seconds(pid: int) -> float:
+  # utime and stime of a running child, in clock ticks (Linux only)
+  with open(f'/proc/{pid}/stat') as f:
+    fields = f.read().rsplit(')', 1)[1].split()
+  assert fields[0] != 'Z', 'the coordinator exited before the measurement ended'
+  return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+@click.command()
+@click.option('-s', '--seconds', 'seconds', type=float, default=10)
+@click.option('-w', '--warmup', 'warmup', type=float, default=3, help='Seconds to let the coordinator import and start before measuring.')
+@click.option('--interactive/--no-interactive', 'interactive', default=True)
+def run(seconds: float, warmup: float, interactive: bool):
+  # the coordinator gets a terminal on stdin that never produces input, and one listener that sleeps
+  # for the whole run so that non-interactive mode has something to wait for instead of exiting
+  pid, _ = pty.fork()
+  if pid == 0:
+    from micra_store import Coordinator, Listener
+    coordinator = Coordinator(config={}, interactive=interactive, should_define=False)
+    coordinator.start_listener(Listener(runner=lambda: time.sleep(warmup + seconds * 2), name='idle'))
+    coordinator.start()
+    os._exit(0)
+  time.sleep(warmup)
+  start_cpu_seconds = process_cpu_seconds(pid=pid)
+  time.sleep(seconds)
+  cpu_seconds = process_cpu_seconds(pid=pid) - start_cpu_seconds
+  os.kill(pid, 9)
+  os.waitpid(pid, 0)
+  print(f'Idle {"interactive" if interactive else "non-interactive"} coordinator used {cpu_seconds:.3f}s CPU in {seconds:.0f}s ({cpu_seconds / seconds * 100:.2f}%)', file=sys.stderr)
+
+if __name__ == '__main__':
+  run()
@@ -0,0 +1,45 @@
+import time
+import pandas as pd
+
+from typing import List
+
+from micra_store.frame import FrameAccumulator
+
+part_rows = 10
+
+def make_part(index: int) -> pd.DataFrame:
+  return pd.DataFrame({
+    'key': [f'job:{index}'] * part_rows,
+    'json_object.score': range(part_rows),
+  })
+
+def grow_by_concatenation(parts: List[pd.DataFrame]) -> pd.DataFrame:
+  # the pattern DataFrame.append produced: every step copies everything accumulated so far
+  df = pd.DataFrame()
+  for part in parts:
+    df = pd.concat([df, part], sort=False)
+  return df
+
+def grow_by_accumulation(parts: List[pd.DataFrame]) -> pd.DataFrame:
+  accumulator = FrameAccumulator()
+  for part in parts:
+    accumulator.add(part)
+  return accumulator.frame()
+
+def measure(f, parts: List[pd.DataFrame]) -> float:
+  start = time.perf_counter()
+  f(parts)
+  return time.perf_counter() - start
+
+def run(row_counts=[1000, 10000, 100000], max_quadratic_rows: int=100000):
+  for rows in row_counts:
+    parts = [make_part(i) for i in range(rows // part_rows)]
+    accumulated = measure(grow_by_accumulation, parts)
+    line = f'{rows:>7} rows: accumulated {accumulated:.3f}s ({accumulated / rows * 1e6:.1f}µs/row)'
+    if rows <= max_quadratic_rows:
+      concatenated = measure(grow_by_concatenation, parts)
+      line += f', concatenated {concatenated:.3f}s ({concatenated / rows * 1e6:.1f}µs/row)'
+    print(line)
+
+if __name__ == '__main__':
+  run()
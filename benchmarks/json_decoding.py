@@ -0,0 +1,26 @@
+import json
+import timeit
+
+from micra_store.structure import ContentConverter, json_decoders, set_json_decoder
+
+def make_serializations(count: int):
+  return [
+    json.dumps({
+      'job': f'job:{i}',
+      'score': i * 0.5,
+      'configuration': {'realm': 'almacen', 'targets': list(range(i % 10))},
+    }).encode()
+    for i in range(count)
+  ]
+
+def run(count: int=100000, repeat: int=5):
+  serializations = make_serializations(count=count)
+  print(f'Decoding {count} JSON objects, best of {repeat}')
+  for name in sorted(json_decoders.keys()):
+    set_json_decoder(name)
+    per_member = min(timeit.repeat(lambda: [ContentConverter.json_object.convert_instance(s) for s in serializations], number=1, repeat=repeat))
+    batch = min(timeit.repeat(lambda: ContentConverter.json_object.convert_instances(serializations), number=1, repeat=repeat))
+    print(f'{name:>8}: per member {per_member:.3f}s, batch {batch:.3f}s')
+
+if __name__ == '__main__':
+  run()
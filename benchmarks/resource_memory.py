@@ -0,0 +1,63 @@
+import datetime
+import tracemalloc
+
+from typing import Dict, List
+
+from micra_store.job import Job
+from micra_store.table import JobTable
+
+def make_contents(index: int) -> Dict[str, str]:
+  return {
+    'source': 'almacen',
+    'realm': 'almacen',
+    'company': f'company_{index % 100}',
+    'action': 'fetch',
+    'target': f'target_{index % 1000}',
+    'objective': 'report',
+    'version': str(index),
+    'configuration': '{"days": 7}',
+    'created': datetime.datetime(2020, 1, 1).isoformat(),
+  }
+
+def make_names(count: int) -> List[str]:
+  return [f'job:{i}:{i}' for i in range(count)]
+
+def measure(f, *args) -> int:
+  tracemalloc.start()
+  result = f(*args)
+  size, _ = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  del result
+  return size
+
+def build_dicts(names: List[str]) -> List[Dict[str, any]]:
+  # the shape of an unslotted instance: a __dict__ holding name and contents
+  return [{'_name': n, '_contents': make_contents(i)} for i, n in enumerate(names)]
+
+def build_jobs(names: List[str]) -> List[Job]:
+  return [Job(name=n, contents=make_contents(i)) for i, n in enumerate(names)]
+
+def build_loaded_jobs(names: List[str]) -> List[Job]:
+  # jobs read with _get or get_many, which also keep a snapshot for computing changes
+  return [Job(name=n)._load(contents=make_contents(i)) for i, n in enumerate(names)]
+
+def build_table(names: List[str]) -> JobTable:
+  table = JobTable()
+  for i, n in enumerate(names):
+    table.append_contents(name=n, contents=make_contents(i))
+  return table
+
+def build_data_frame(names: List[str]):
+  return build_table(names).to_data_frame()
+
+def run(counts=[10000, 100000]):
+  for count in counts:
+    names = make_names(count)
+    line = f'{count:>7} jobs:'
+    for label, f in [('dicts', build_dicts), ('jobs', build_jobs), ('loaded jobs', build_loaded_jobs), ('table', build_table), ('data frame', build_data_frame)]:
+      size = measure(f, names)
+      line += f' {label} {size / count:.0f}B/job'
+    print(line)
+
+if __name__ == '__main__':
+  run()
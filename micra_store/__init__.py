@@ -2,7 +2,13 @@ from . import user
 from . import structure
 from . import command
 from .error import MicraError, MicraInputTimeout, MicraSubprocessEnded, MicraQuit, MicraResurrect, MicraStopRetry
-from .base import uuid, retry
-from .resource import Resource
-from .job import Job
-from .coordinator import Listener, Coordinator
\ No newline at end of file
+from .base import uuid, retry, async_retry
+from .frame import FrameAccumulator
+from .metrics import Counter, Gauge, Histogram, MetricsRegistry, metrics
+from .profile import Profiler, CProfileProfiler, SamplingProfiler, profilers, profiled
+from .connection import ConnectionPools
+from .resource import FieldCodec, StringCodec, JSONCodec, DateTimeCodec, Field, Resource
+from .job import Job, score_jobs, dispatch_jobs, finish_job
+from .table import ResourceTable, JobTable
+from .coordinator import SignalingQueue, QueuedCommand, SubprocessExit, Listener, Coordinator
+from .async_coordinator import AsyncCommandQueue, AsyncCoordinator
\ No newline at end of file
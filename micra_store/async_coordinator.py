@@ -0,0 +1,530 @@
+from __future__ import annotations
+
+import os
+import sys
+import time
+import shlex
+import socket
+import atexit
+import asyncio
+import threading
+import redis.asyncio
+
+from typing import Dict, Optional, List, Tuple, Callable
+from concurrent.futures import ThreadPoolExecutor
+from queue import Empty
+from redis.exceptions import ResponseError
+from .base import async_retry
+from .error import MicraSubprocessEnded, MicraQuit
+from .coordinator import Coordinator, Listener, QueuedCommand, SubprocessExit
+from .metrics import metrics
+from moda.style import Format
+from moda.process import spawn_process
+
+class AsyncCommandQueue:
+  _queue: asyncio.Queue
+  _loop: Optional[asyncio.AbstractEventLoop]
+
+  def __init__(self, loop: Optional[asyncio.AbstractEventLoop]=None):
+    self._queue = asyncio.Queue()
+    self._loop = loop
+
+  def bind(self, loop: Optional[asyncio.AbstractEventLoop]):
+    self._loop = loop
+
+  def _in_loop(self) -> bool:
+    # until a loop is bound nothing can be waiting on the queue, so items are added directly
+    if self._loop is None:
+      return True
+    try:
+      return asyncio.get_running_loop() is self._loop
+    except RuntimeError:
+      return False
+
+  def put(self, item: any, block: bool=True, timeout: Optional[float]=None):
+    if self._in_loop():
+      self._queue.put_nowait(item)
+    else:
+      self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+
+  def put_nowait(self, item: any):
+    self.put(item, block=False)
+
+  def signal(self):
+    self.put(None)
+
+  def get_nowait(self) -> any:
+    try:
+      return self._queue.get_nowait()
+    except asyncio.QueueEmpty:
+      raise Empty
+
+  async def get(self, timeout: Optional[float]=None) -> any:
+    try:
+      return await asyncio.wait_for(self._queue.get(), timeout=timeout)
+    except asyncio.TimeoutError:
+      raise Empty
+
+  def task_done(self):
+    if self._in_loop():
+      self._queue.task_done()
+    else:
+      self._loop.call_soon_threadsafe(self._queue.task_done)
+
+  def qsize(self) -> int:
+    return self._queue.qsize()
+
+class AsyncCoordinator(Coordinator):
+  async_redis: Optional[redis.asyncio.Redis] = None
+  listeners: Dict[Listener, asyncio.Future]
+  _loop: Optional[asyncio.AbstractEventLoop]
+  _pending_listeners: List[Listener]
+  _executor: Optional[ThreadPoolExecutor]
+  _command_executor: Optional[ThreadPoolExecutor]
+
+  def __init__(self, *args, **kwargs):
+    super().__init__(*args, **kwargs)
+    self._loop = None
+    self._pending_listeners = []
+    self._executor = None
+    self._command_executor = None
+
+  def create_queue(self) -> AsyncCommandQueue:
+    # listener starters keep a reference to the queue, so it is created once and bound to the loop in start_async
+    return AsyncCommandQueue()
+
+  @classmethod
+  def listener_status(cls, listener: Listener, thread: asyncio.Future) -> str:
+    info = listener.get_info()
+    info_text = f' [{", ".join(f"{k}: {v}" for k, v in info.items())}]' if info else ''
+    return f'Listening: {listener.name}{info_text} ({id(thread)}) {"dead" if thread.done() else "alive"}'
+
+  def connect(self):
+    super().connect()
+    self.async_redis = redis.asyncio.Redis(**self.config['redis'])
+
+  def disconnect(self):
+    super().disconnect()
+    self.async_redis = None
+
+  def _in_loop(self) -> bool:
+    try:
+      return asyncio.get_running_loop() is self._loop
+    except RuntimeError:
+      return False
+
+  def start_listener(self, listener: Listener, force: bool=False):
+    if not self.should_listen and not force:
+      return
+    if self._loop is None:
+      self._pending_listeners.append(listener)
+      return
+    if not self._in_loop():
+      # commands run on executor threads, and tasks can only be created on the loop
+      self._loop.call_soon_threadsafe(lambda: self.start_listener(listener=listener, force=force))
+      return
+    if asyncio.iscoroutinefunction(listener.runner):
+      future = self._loop.create_task(listener.runner())
+      if listener._stopper is None:
+        loop = self._loop
+
+        def stop_task() -> bool:
+          loop.call_soon_threadsafe(future.cancel)
+          return True
+        listener._stopper = stop_task
+    else:
+      # synchronous runners keep their own thread and resolve a future when they return
+      future = self._loop.create_future()
+      loop = self._loop
+
+      def run_listener():
+        try:
+          listener.runner()
+        finally:
+          loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+      threading.Thread(target=run_listener, daemon=True).start()
+    future.add_done_callback(lambda _: self.queue.signal())
+    self.user.present_message(Format().cyan()(f'Starting listener {listener.name} ({id(future)}).'))
+    with self._listeners_lock:
+      self.listeners[listener] = future
+
+  def stop_listener(self, thread_id: int):
+    items = list(filter(lambda i: id(i[1]) == thread_id, self.listeners.items()))
+    assert len(items) <= 1
+    for listener, future in items:
+      if not listener.stop():
+        self.user.present_message(Format().red()(f'Cannot stop listener {listener.name} ({id(future)}).'))
+
+  def update_listeners(self) -> bool:
+    updated = False
+    for listener, future in list(self.listeners.items()):
+      if not future.done():
+        continue
+      self.user.present_message(Format().cyan()(f'Listener {id(future)} ended.'))
+      try:
+        listener.clean()
+      except (KeyboardInterrupt, SystemExit):
+        raise
+      except Exception as e:
+        self.user.present_message(f'An error occurred while cleaning listener {listener.name} ({id(future)})', error=e)
+      with self._listeners_lock:
+        del self.listeners[listener]
+      updated = True
+    return updated
+
+  async def run_subprocess(self, run_args: List[str], eternal: bool=False):
+    process, terminator = spawn_process(run_args=run_args)
+    command = Coordinator.subprocess_command(run_args)
+    loop = asyncio.get_running_loop()
+    reaped = loop.create_future()
+
+    def reap():
+      # wait4 reports the resource usage that the asyncio child watchers discard; a daemon thread
+      # rather than the default executor keeps a running child from holding up the loop shutdown
+      result = os.wait4(process.pid, 0)
+      loop.call_soon_threadsafe(lambda: reaped.done() or reaped.set_result(result))
+
+    self._supervised_pids.add(process.pid)
+    self.queue.put(f'subprocess {process.pid} set {shlex.quote(command)}')
+    try:
+      threading.Thread(target=reap, daemon=True).start()
+      _, status, rusage = await reaped
+    finally:
+      self._supervised_pids.discard(process.pid)
+    return_code = os.waitstatus_to_exitcode(status)
+    process.returncode = return_code
+    atexit.unregister(terminator)
+    self.record_subprocess_exit(subprocess_exit=SubprocessExit(
+      pid=process.pid,
+      command=command,
+      return_code=return_code,
+      cpu_seconds=rusage.ru_utime + rusage.ru_stime,
+      max_rss_kb=rusage.ru_maxrss
+    ))
+    self.queue.put(f'subprocess {process.pid} clear')
+    if return_code != 0 or eternal:
+      raise MicraSubprocessEnded(pid=process.pid)
+
+  def start_accept_many_commands(self, keys: List[str], prefetch: Optional[int]=None, processing_key: Optional[str]=None):
+    r = self.async_redis
+    accept_config = self.config.get('accept', {})
+    prefetch = prefetch if prefetch is not None else accept_config.get('prefetch', 1)
+    processing_key = processing_key if processing_key is not None else accept_config.get('processing_key')
+    assert keys
+    assert prefetch > 0
+    if processing_key is not None and len(keys) > 1:
+      raise ValueError('A processing key can only be used when accepting from a single key')
+    recovered = False
+    dequeued = {k: 0 for k in keys}
+    key_names = {**{k.encode(): k for k in keys}, **{k: k for k in keys}}
+    started = time.monotonic()
+
+    def report(key_commands: List[Tuple[str, str]]):
+      for key, _ in key_commands:
+        dequeued[key] += 1
+        metrics.counter('accept_dequeued_total', key=key).increment()
+      elapsed = max(time.monotonic() - started, 1e-9)
+      listener.update_info({
+        i: v
+        for k in keys if dequeued[k]
+        for i, v in [(f'{k} dequeued', dequeued[k]), (f'{k} rate', f'{dequeued[k] / elapsed:.2f}/s')]
+      })
+
+    async def pop_more(count: int) -> List[Tuple[str, str]]:
+      # fill the remaining window from the keys in priority order
+      key_commands = []
+      for key in keys:
+        if len(key_commands) == count:
+          break
+        if processing_key is None:
+          key_commands += [(key, c) for c in await r.rpop(key, count - len(key_commands)) or []]
+        else:
+          pipe = r.pipeline(transaction=False)
+          for _ in range(count):
+            pipe.lmove(key, processing_key, 'RIGHT', 'LEFT')
+          key_commands += [(key, c) for c in await pipe.execute() if c is not None]
+      return key_commands
+
+    @async_retry()
+    async def accept_commands():
+      nonlocal recovered
+      loop = asyncio.get_running_loop()
+      if processing_key is not None and not recovered:
+        # requeue commands that a previous run accepted but never acknowledged, oldest last
+        while await r.lmove(processing_key, keys[0], 'LEFT', 'RIGHT') is not None:
+          pass
+        recovered = True
+      # each buffered command holds a slot until it has run
+      window = asyncio.BoundedSemaphore(prefetch)
+
+      def acknowledger(command: str) -> Callable[[], None]:
+        def release():
+          if processing_key is not None:
+            loop.create_task(r.lrem(processing_key, 1, command))
+          window.release()
+
+        def acknowledge():
+          loop.call_soon_threadsafe(release)
+        return acknowledge
+
+      while True:
+        await window.acquire()
+        if processing_key is None:
+          # BRPOP checks the keys in order, so earlier keys take priority
+          popped_key, command = await r.brpop(keys)
+          key_commands = [(key_names[popped_key], command)]
+        else:
+          key_commands = [(keys[0], await r.blmove(keys[0], processing_key, 0, 'RIGHT', 'LEFT'))]
+        count = 0
+        while count < prefetch - 1 and not window.locked():
+          # an unlocked semaphore is acquired without waiting
+          await window.acquire()
+          count += 1
+        if count:
+          more = await pop_more(count=count)
+          for _ in range(count - len(more)):
+            window.release()
+          key_commands += more
+        for _, command in key_commands:
+          self.queue.put(QueuedCommand(command=command, acknowledger=acknowledger(command)))
+        report(key_commands=key_commands)
+
+    listener = Listener(runner=accept_commands, info={
+      **({'key': keys[0]} if len(keys) == 1 else {'keys': ', '.join(keys)}),
+      'prefetch': prefetch,
+      **({'processing_key': processing_key} if processing_key is not None else {}),
+    })
+    self.start_listener(listener)
+
+  def start_subscribe_commands(self, patterns: List[str], batch_size: Optional[int]=None, max_pending: Optional[int]=None):
+    subscribe_config = self.config.get('subscribe', {})
+    batch_size = batch_size if batch_size is not None else subscribe_config.get('batch_size', 100)
+    max_pending = max_pending if max_pending is not None else subscribe_config.get('max_pending', 1000)
+    assert patterns
+    assert batch_size > 0
+    pubsub = self.async_redis.pubsub(ignore_subscribe_messages=True)
+    totals = {'received': 0, 'dropped': 0}
+    last_drained = None
+
+    @async_retry()
+    async def subscribe_commands():
+      nonlocal last_drained
+      if not pubsub.patterns:
+        await pubsub.psubscribe(*patterns)
+      while True:
+        message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1)
+        if message is None:
+          continue
+        # drain whatever else has already arrived before handing the batch over
+        messages = [message]
+        while len(messages) < batch_size:
+          message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=0)
+          if message is None:
+            break
+          messages.append(message)
+        dropped = 0
+        for message in messages:
+          if self.queue.qsize() >= max_pending:
+            dropped += 1
+            continue
+          self.queue.put(message['data'])
+        totals['received'] += len(messages)
+        totals['dropped'] += dropped
+        metrics.counter('subscribe_received_total').increment(len(messages))
+        metrics.counter('subscribe_dropped_total').increment(dropped)
+        # full batches mean that messages arrive faster than they are drained
+        drained = time.monotonic()
+        listener.update_info({
+          **totals,
+          'last_batch': len(messages),
+          'drain_interval': f'{drained - last_drained:.3f}s' if last_drained is not None else None,
+        })
+        last_drained = drained
+
+    # listeners are cleaned on the loop, which closes the connection once the task has ended
+    listener = Listener(runner=subscribe_commands, cleaner=lambda: asyncio.ensure_future(pubsub.aclose()), info={
+      'patterns': ', '.join(patterns),
+      'max_pending': max_pending,
+      **totals,
+    })
+    self.start_listener(listener)
+
+  def start_consume_stream(self, key: str, group: str, consumer: Optional[str]=None, handler: Optional[Callable[[str, str, List[Tuple[str, Dict[str, any]]]], List[str]]]=None):
+    if handler is None:
+      if type(self).handle_stream_entries is Coordinator.handle_stream_entries:
+        raise NotImplementedError(f'{type(self).__name__} does not handle stream entries')
+      handler = self.handle_stream_entries
+    r = self.async_redis
+    consume_config = self.config.get('consume', {})
+    consumer = consumer if consumer is not None else f'{socket.gethostname()}-{os.getpid()}'
+    count = consume_config.get('count', 100)
+    block_ms = consume_config.get('block_ms', 1000)
+    claim_idle_ms = consume_config.get('claim_idle_ms', 60000)
+    claim_interval = consume_config.get('claim_interval', 30)
+    max_length = consume_config.get('max_length')
+    trim_interval = consume_config.get('trim_interval', 60)
+    totals = {'consumed': 0, 'acknowledged': 0, 'claimed': 0}
+
+    async def process(entries: List[Tuple[str, Optional[Dict[str, any]]]], claimed: bool=False):
+      # entries deleted from the stream while pending come back without fields
+      entries = [e for e in entries if e[1] is not None]
+      if not entries:
+        return
+      with metrics.timer('consume_handler_seconds', key=key, group=group):
+        if asyncio.iscoroutinefunction(handler):
+          acknowledged = await handler(key, group, entries)
+        else:
+          # synchronous handlers run on a thread so that they do not hold up other listeners
+          acknowledged = await asyncio.to_thread(handler, key, group, entries)
+      if acknowledged:
+        await r.xack(key, group, *acknowledged)
+      totals['consumed'] += len(entries)
+      metrics.counter('consume_entries_total', key=key, group=group).increment(len(entries))
+      totals['acknowledged'] += len(acknowledged)
+      if claimed:
+        totals['claimed'] += len(entries)
+      listener.update_info(totals)
+
+    @async_retry()
+    async def consume_stream():
+      try:
+        await r.xgroup_create(key, group, id='0', mkstream=True)
+      except ResponseError as e:
+        if 'BUSYGROUP' not in str(e):
+          raise
+      claim_id = '0-0'
+      last_claim = 0
+      last_trim = time.monotonic()
+      while True:
+        now = time.monotonic()
+        if claim_idle_ms and now - last_claim >= claim_interval:
+          claim_result = await r.xautoclaim(key, group, consumer, min_idle_time=claim_idle_ms, start_id=claim_id, count=count)
+          claim_id = claim_result[0]
+          last_claim = now
+          await process(entries=claim_result[1], claimed=True)
+        response = await r.xreadgroup(group, consumer, {key: '>'}, count=count, block=block_ms)
+        for _, entries in response or []:
+          await process(entries=entries)
+        if max_length is not None and now - last_trim >= trim_interval:
+          await r.xtrim(key, maxlen=max_length, approximate=True)
+          last_trim = now
+
+    listener = Listener(runner=consume_stream, info={
+      'key': key,
+      'group': group,
+      'consumer': consumer,
+      **totals,
+    })
+    self.start_listener(listener)
+
+  def read_user_command(self) -> bool:
+    line = sys.stdin.readline()
+    if not line:
+      self._loop.remove_reader(sys.stdin.fileno())
+      self.user.present_message(Format().yellow()('Input closed, continuing non-interactively.'))
+      self.user.interactive = False
+      self.queue.signal()
+      return False
+    user_command = line.strip()
+    if user_command:
+      self.queue.put(user_command)
+    return True
+
+  async def run_concurrent_command_async(self, queued_command: QueuedCommand, from_queue: bool):
+    await self._loop.run_in_executor(self._executor, self.run_concurrent_command, queued_command, from_queue)
+
+  async def try_queued_command(self, queued_command: QueuedCommand, from_queue: bool) -> bool:
+    command = queued_command.command
+    if self._executor is not None:
+      micra_command = self.match_command(command=command)
+      if micra_command is not None and micra_command.can_run_concurrently(command=command):
+        with self._statistics_lock:
+          self._pool_commands += 1
+        self._loop.create_task(self.run_concurrent_command_async(queued_command=queued_command, from_queue=from_queue))
+        return True
+    try:
+      # other commands still run one at a time, but off the loop so that listener tasks keep running
+      await self._loop.run_in_executor(self._command_executor, self.run_command, command)
+    except (KeyboardInterrupt, SystemExit):
+      raise
+    except MicraQuit:
+      self.finish_command(queued_command=queued_command, from_queue=False)
+      return False
+    except Exception as e:
+      self.user.present_message(message=f'Error running command: {command}', error=e)
+    self.finish_command(queued_command=queued_command, from_queue=from_queue)
+    return True
+
+  async def start_async(self):
+    self._loop = asyncio.get_running_loop()
+    self.queue.bind(loop=self._loop)
+    if self.workers:
+      self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='micra_command')
+    self._command_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='micra_serial_command')
+    for listener in self._pending_listeners:
+      self.start_listener(listener=listener, force=True)
+    self._pending_listeners = []
+
+    if self.should_define:
+      for definition in self.definitions:
+        self.user.present_message(Format().blue()(f'Defining {definition.identifier}'))
+        self.define_structure(element=definition)
+
+    self.running = True
+    should_print_menu = True
+    if self.user.interactive:
+      self.user.present_message(Format().green()('Starting in interactive mode.'))
+      self._loop.add_reader(sys.stdin.fileno(), self.read_user_command)
+    try:
+      while True:
+        should_print_menu = self.update_listeners() or should_print_menu
+        should_print_menu = self.update_subprocesses() or should_print_menu
+        if self.commands_to_run:
+          item = self.commands_to_run.pop(0)
+          from_queue = False
+        else:
+          try:
+            item = self.queue.get_nowait()
+          except Empty:
+            if not self.listeners and not self.subprocesses and not self.user.interactive:
+              self.user.present_message(Format().yellow()('Nothing to do.'))
+              break
+            if self.user.interactive and should_print_menu:
+              self.user.present_message('\n'.join(c.display_styled.styled for c in self.commands if c.can_run))
+              print('µ—>', end=' ')
+              sys.stdout.flush()
+              should_print_menu = False
+            try:
+              item = await self.queue.get(timeout=self.wait_timeout)
+            except Empty:
+              continue
+          from_queue = True
+        if item is None:
+          # wakeup signals carry no command
+          self.queue.task_done()
+          continue
+        queued_command = item if isinstance(item, QueuedCommand) else QueuedCommand(command=item)
+        command_result = await self.try_queued_command(queued_command=queued_command, from_queue=from_queue)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        if command_result is False:
+          break
+        should_print_menu = True
+    finally:
+      if self.user.interactive:
+        self._loop.remove_reader(sys.stdin.fileno())
+      for future in self.listeners.values():
+        future.cancel()
+      for executor in [self._executor, self._command_executor]:
+        if executor is not None:
+          executor.shutdown(wait=False, cancel_futures=True)
+      self._executor = None
+      self._command_executor = None
+      self.queue.bind(loop=None)
+      self._loop = None
+      self.running = False
+
+  def start(self):
+    assert not self.running
+    asyncio.run(self.start_async())
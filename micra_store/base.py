@@ -3,6 +3,7 @@ import traceback
 import click
 import atexit
 import time
+import asyncio
 
 from uuid import uuid4
 from typing import Dict, List, Optional
@@ -48,3 +49,26 @@ def retry(enabled: bool=True, pdb_enabled: bool=False, queue: Optional[Queue]=No
         time.sleep(1)
     return wrapper
   return wrap
+
+def async_retry(enabled: bool=True):
+  def wrap(f):
+    @wraps(f)
+    async def wrapper(*args, **kwargs):
+      while True:
+        if is_exiting:
+          break
+        try:
+          return await f(*args, **kwargs)
+        except (KeyboardInterrupt, SystemExit, asyncio.CancelledError):
+          raise
+        except MicraStopRetry:
+          raise
+        except:
+          if enabled:
+            traceback.print_exc()
+          else:
+            raise
+        log(f'Retrying {f.__name__}...')
+        await asyncio.sleep(1)
+    return wrapper
+  return wrap
@@ -1,2 +1,2 @@
 from ..command_base import Command
-from .coordinator_commands import StartCommand, QuitCommand, StatusCommand, ListCommand, ViewCommand, SubprocessCommand, MessageCommand, ListenCommand, ForwardCommand
\ No newline at end of file
+from .coordinator_commands import StartCommand, QuitCommand, StatusCommand, ListCommand, ViewCommand, MetricsCommand, SubprocessCommand, MessageCommand, ListenCommand, ForwardCommand
\ No newline at end of file
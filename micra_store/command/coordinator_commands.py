@@ -1,5 +1,6 @@
 import click
 import json
+import shlex
 import re
 import io
 import os
@@ -9,10 +10,13 @@ import pandas as pd
 
 from ..command_base import CommandCategory, Command
 from ..coordinator import Coordinator
-from ..structure import Element, ContentType, Structure, micra_content_types, micra_structures
+from ..structure import Element, Structure, definition_registry
 from ..error import MicraQuit
+from ..frame import FrameAccumulator
+from ..metrics import metrics
+from ..profile import profiled, profilers, CProfileProfiler
 from moda.style import Styleds, CustomStyled, Format
-from typing import List, Set, TypeVar, Generic, Callable
+from typing import List, Set, TypeVar, Generic, Callable, Optional
 from enum import Enum
 from redis import Redis
 from pprint import pformat
@@ -27,9 +31,9 @@ class ElementTarget(Enum):
 
   def get_elements(self, redis: Redis) -> List[Element]:
     if self is ElementTarget.content_type:
-      return [ContentType.from_dict(json.loads(v)) for v in redis.hgetall(micra_content_types.key).values()]
+      return definition_registry.get_content_types(redis=redis)
     elif self is ElementTarget.structure:
-      return [Structure.from_dict(json.loads(v)) for v in redis.hgetall(micra_structures.key).values()]
+      return definition_registry.get_structures(redis=redis)
 
 class OutputFormat(Enum):
   string = 'string'
@@ -48,7 +52,8 @@ class OutputFormat(Enum):
 
     if self is OutputFormat.string:
       if items_are_structures:
-        return '\n\n'.join(f'{s.identifier} {s.display_metadata(redis=redis)}\n{"—" * len(s.identifier)}\n{s.display_detail(redis=redis)}' for s in items)
+        displays = Structure.get_displays(structures=items, redis=redis)
+        return '\n\n'.join(f'{s.identifier} {m}\n{"—" * len(s.identifier)}\n{d}' for s, (m, d) in zip(items, displays))
       else:
         return '\n'.join(str(i) for i in items)
     elif self is OutputFormat.pretty:
@@ -58,30 +63,24 @@ class OutputFormat(Enum):
         return '\n\n'.join(pformat(item) for i in items)
     elif self is OutputFormat.json:
       if items_are_structures:
-        # items = [
-        #   {
-        #     **json.loads(item.get_data_frame(redis=redis).to_json(orient='table')),
-        #     'identifier': item.identifier,
-        #   }
-        #   for item in items
-        # ]
         json_items = []
         for item in items:
           data_frame = item.get_data_frame(redis=redis)
           if 'level_0' in data_frame.columns:
             data_frame.drop(['level_0'], axis=1, inplace=True)
-          json_items.append({
-            **json.loads(data_frame.to_json(orient='table')),
-            'identifier': item.identifier,
-          })
-      return json.dumps(json_items)
+          # splice the identifier into the serialized table rather than parsing it back
+          table_json = data_frame.to_json(orient='table')
+          json_items.append(f'{{"identifier": {json.dumps(item.identifier)}, {table_json[1:]}')
+        return f'[{", ".join(json_items)}]'
+      return json.dumps(items)
     elif self is OutputFormat.csv:
       if items_are_structures:
-        df = pd.DataFrame()
+        accumulator = FrameAccumulator()
         for structure in items:
           structure_df = structure.get_data_frame(redis=redis)
           structure_df['identifier'] = structure.identifier
-          df = df.append(structure_df)
+          accumulator.add(structure_df)
+        df = accumulator.frame()
         # df = df.reindex(sorted(df.columns), axis=1)
       else:
         df = pd.DataFrame([{'item': i} for i in items])
@@ -102,6 +101,34 @@ class OutputFormat(Enum):
       console.mainloop(local_ns=local_ns)
       return None
 
+  def stream(self, items: List[any], redis: Redis, emit: Callable[[str], None]):
+    items_are_structures = all(isinstance(i, Structure) for i in items)
+    if self is OutputFormat.json:
+      if items_are_structures:
+        for structure in items:
+          for data_frame in structure.iterate_data_frames(redis=redis):
+            emit(data_frame.assign(identifier=structure.identifier).to_json(orient='records', lines=True).rstrip('\n'))
+      else:
+        for item in items:
+          emit(json.dumps(item))
+    elif self is OutputFormat.csv:
+      if items_are_structures:
+        columns = None
+        for structure in items:
+          for data_frame in structure.iterate_data_frames(redis=redis):
+            data_frame = data_frame.assign(identifier=structure.identifier)
+            buf = io.StringIO()
+            # repeat the header whenever the columns differ from the previous chunk
+            data_frame.to_csv(buf, header=list(data_frame.columns) != columns)
+            columns = list(data_frame.columns)
+            emit(buf.getvalue().rstrip('\n'))
+      else:
+        emit(self.format(items=items, redis=redis).rstrip('\n'))
+    else:
+      output = self.format(items=items, redis=redis)
+      if output is not None:
+        emit(output)
+
 # ---------------------------------------------------------------------------
 # Decorators
 # ---------------------------------------------------------------------------
@@ -109,6 +136,10 @@ class OutputFormat(Enum):
 format_command_option = click.option('-f', '--format', 'format_value', type=click.Choice([f.value for f in OutputFormat]), default=OutputFormat.string.value)
 publish_command_option = click.option('-p', '--publish', 'publish', type=str, multiple=True)
 echo_command_option = click.option('-e', '--echo', 'should_echo', is_flag=True)
+stream_command_option = click.option('--stream', 'should_stream', is_flag=True, help='Emit json and csv output in chunks as structure pages are read.')
+profile_command_option = click.option('--profile', 'profile_directory', type=click.Path(file_okay=False), help='Profile the command and write the result to this directory.')
+profile_mode_command_option = click.option('--profile-mode', 'profile_mode', type=click.Choice(list(profilers.keys())), default=CProfileProfiler.name)
+profile_channel_command_option = click.option('--profile-channel', 'profile_channel', type=str, help='Publish a summary of the top frames to this channel.')
 
 # ---------------------------------------------------------------------------
 # Commands
@@ -174,6 +205,7 @@ class OutputCommand(Generic[C], CoordinatorCommand[C]):
   def micra_decorators(self) -> List[Callable[[Callable[..., any]], Callable[..., any]]]:
     return [
       self.publish_command_output,
+      self.profile_command_output,
       self.format_command_output,
     ]
 
@@ -183,27 +215,60 @@ class OutputCommand(Generic[C], CoordinatorCommand[C]):
       publish_command_option,
       echo_command_option,
       format_command_option,
+      stream_command_option,
+      profile_command_option,
+      profile_mode_command_option,
+      profile_channel_command_option,
     ]
 
+  def can_run_concurrently(self, command: str) -> bool:
+    # info commands only read from Redis, except for dataframe output which embeds an interactive shell
+    if self.category is not CommandCategory.info:
+      return False
+    argv = shlex.split(command)
+    try:
+      # parse the way run will, so that every spelling of the format option is recognized
+      context = self.click_command.make_context(argv[0], argv[1:], resilient_parsing=True)
+    except click.exceptions.ClickException:
+      return False
+    return context.params.get('format_value') != OutputFormat.dataframe.value
+
   def format_command_output(self, f: Callable[..., any]) -> Callable[..., any]:
-    def wrapped(*args, format_value: str, **kwargs):
+    def wrapped(*args, format_value: str, should_stream: bool, emit: Callable[[str], None], **kwargs):
       format = OutputFormat(format_value)
       items = f(*args, **kwargs)
       if items is None:
         return ''
-      return format.format(items=items, redis=self.context.redis)
+      with metrics.timer('render_seconds', command=self.name, format=format.value):
+        if should_stream:
+          format.stream(items=items, redis=self.context.redis, emit=emit)
+          return None
+        return format.format(items=items, redis=self.context.redis)
+
+    return wrapped
+
+  def profile_command_output(self, f: Callable[..., any]) -> Callable[..., any]:
+    def wrapped(*args, profile_directory: Optional[str], profile_mode: str, profile_channel: Optional[str], **kwargs):
+      if profile_directory is None:
+        return f(*args, **kwargs)
+      with profiled(directory=profile_directory, label=self.name, mode=profile_mode, redis=self.context.redis, channel=profile_channel):
+        return f(*args, **kwargs)
 
     return wrapped
 
   def publish_command_output(self, f: Callable[..., any]) -> Callable[..., any]:
     def wrapped(*args, publish: List[str], should_echo: bool, **kwargs):
-      result = f(*args, **kwargs)
-      for channel in publish:
-        subscriber_count = self.context.redis.publish(channel, result)
-        if should_echo:
-          print(f'Sent response to {subscriber_count} subscribers.')
-      if not publish or should_echo:
-        print(result)
+      def emit(output: str):
+        for channel in publish:
+          subscriber_count = self.context.redis.publish(channel, output)
+          if should_echo:
+            print(f'Sent response to {subscriber_count} subscribers.')
+        if not publish or should_echo:
+          print(output, flush=True)
+
+      result = f(*args, emit=emit, **kwargs)
+      if result is not None:
+        emit(result)
 
     return wrapped
 
@@ -277,8 +342,11 @@ class ViewCommand(OutputCommand[Coordinator]):
     @click.command(name=self.name)
     @click.option('-s', '--structure-id', 'ids', help='Filter output by structure IDs.', multiple=True)
     @click.option('-t', '--tag', 'tags', help='Filter output by tags.', multiple=True)
+    @click.option('--page-size', 'page_size', type=click.IntRange(min=1), help='Read structure content in pages of this many members.')
+    @click.option('--offset', 'offset', type=int, default=0, help='Skip this many members of each structure, counting from the end if negative.')
+    @click.option('--limit', 'limit', type=click.IntRange(min=1), help='Read at most this many members of each structure.')
     @self.decorate
-    def click_command(ids: List[str], tags: List[str]):
+    def click_command(ids: List[str], tags: List[str], page_size: Optional[int], offset: int, limit: Optional[int]):
       id_regexes = list(map(re.compile, ids))
       def key_matches(keys: Set[str], regexes: List[re.Pattern]):
         for key in keys:
@@ -286,24 +354,47 @@ class ViewCommand(OutputCommand[Coordinator]):
             if regex.match(key): return True
         return False
 
-      filtered_keys = [
-        k
-        for k in self.context.redis.hkeys(micra_structures.key)
-        if not ids or key_matches(keys={k}, regexes=id_regexes)
-      ]
-      if not filtered_keys:
-        return []
-
       structures = [
-        Structure.from_dict(json.loads(v))
-        for v in self.context.redis.hmget(micra_structures.key, filtered_keys)
+        s
+        for s in definition_registry.get_structures(redis=self.context.redis)
+        if not ids or key_matches(keys={s.identifier}, regexes=id_regexes)
       ]
       tag_regexes = list(map(re.compile, tags))
       structures = list(filter(lambda s: not tags or key_matches(keys=s.tags, regexes=tag_regexes), structures))
+      if page_size is not None:
+        structures = [s.with_page_size(page_size=page_size) for s in structures]
+      if offset or limit is not None:
+        stop = None if limit is None else offset + limit - 1 if offset >= 0 else min(offset + limit - 1, -1)
+        structures = [s.with_content_range(content_range=(offset, stop)) for s in structures]
       return structures
 
     return click_command
 
+class MetricsCommand(OutputCommand[Coordinator]):
+  @property
+  def category(self) -> CommandCategory:
+    return CommandCategory.info
+
+  @property
+  def name(self) -> str:
+    return 'metrics'
+
+  @property
+  def click_command(self) -> click.Command:
+    @click.command(name=self.name)
+    @click.option('--prometheus', 'prometheus_path', type=click.Path(dir_okay=False, writable=True), help='Also write the metrics in the Prometheus text format to this file.')
+    @click.option('--reset', 'should_reset', is_flag=True, help='Clear the metrics after reporting them.')
+    @self.decorate
+    def click_command(prometheus_path: Optional[str], should_reset: bool):
+      snapshot = metrics.snapshot()
+      if prometheus_path is not None:
+        metrics.write_prometheus(path=prometheus_path)
+      if should_reset:
+        metrics.reset()
+      return snapshot
+
+    return click_command
+
 class SubprocessCommand(CoordinatorCommand[Coordinator]):
   @property
   def category(self) -> CommandCategory:
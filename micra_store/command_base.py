@@ -82,6 +82,9 @@ class Command(Generic[T]):
   def click_decorators(self) -> List[Callable[[Callable[..., any]], Callable[..., any]]]:
     return []
 
+  def can_run_concurrently(self, command: str) -> bool:
+    return False
+
   def matches_command(self, command: str):
     return shlex.split(command)[0] in self.all_names
 
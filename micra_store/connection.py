@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from redis import Redis, ConnectionPool, BlockingConnectionPool, SSLConnection, UnixDomainSocketConnection
+from typing import Dict, List
+
+default_request_pool_options = {
+  'max_connections': 50,
+  'timeout': 20,
+  'socket_keepalive': True,
+  'health_check_interval': 30,
+}
+
+default_blocking_pool_options = {
+  'socket_keepalive': True,
+  'health_check_interval': 30,
+}
+
+# Redis() options that configure the client rather than its connections
+client_only_options = {'single_connection_client', 'connection_pool'}
+tcp_only_options = {'host', 'port', 'socket_connect_timeout', 'socket_keepalive', 'socket_keepalive_options'}
+
+def connection_options(redis_config: Dict[str, any]) -> Dict[str, any]:
+  # translate Redis() options into connection pool options the way the client does
+  options = {k: v for k, v in redis_config.items() if k not in client_only_options}
+  unix_socket_path = options.pop('unix_socket_path', None)
+  ssl = options.pop('ssl', False)
+  if unix_socket_path is not None:
+    options = {k: v for k, v in options.items() if k not in tcp_only_options and not k.startswith('ssl_')}
+    options.update(path=unix_socket_path, connection_class=UnixDomainSocketConnection)
+  elif ssl:
+    options['connection_class'] = SSLConnection
+  else:
+    options = {k: v for k, v in options.items() if not k.startswith('ssl_')}
+  return options
+
+class ConnectionPools:
+  request: BlockingConnectionPool
+  blocking: ConnectionPool
+
+  def __init__(self, redis_config: Dict[str, any], pools_config: Dict[str, Dict[str, any]]={}):
+    self.request = BlockingConnectionPool(**connection_options(redis_config={
+      **default_request_pool_options,
+      **redis_config,
+      **pools_config.get('request', {}),
+    }))
+    # blocking consumers hold their connection while they wait, so this pool opens a new connection
+    # instead of waiting for a free one, up to redis-py's default max_connections unless configured
+    self.blocking = ConnectionPool(**connection_options(redis_config={
+      **default_blocking_pool_options,
+      **redis_config,
+      **pools_config.get('blocking', {}),
+    }))
+
+  @classmethod
+  def from_config(cls, config: Dict[str, any]) -> ConnectionPools:
+    return cls(redis_config=config['redis'], pools_config=config.get('redis_pools', {}))
+
+  @classmethod
+  def pool_usage(cls, pool: ConnectionPool) -> Dict[str, any]:
+    # redis-py does not expose pool utilisation publicly
+    if isinstance(pool, BlockingConnectionPool):
+      created = len(pool._connections)
+      idle = len([c for c in list(pool.pool.queue) if c is not None])
+    else:
+      created = pool._created_connections
+      idle = len(pool._available_connections)
+    return {
+      'in_use': created - idle,
+      'idle': idle,
+      'max': pool.max_connections,
+    }
+
+  @classmethod
+  def pool_status(cls, name: str, pool: ConnectionPool) -> str:
+    usage = cls.pool_usage(pool=pool)
+    return f'Redis pool: {name} {usage["in_use"]} in use, {usage["idle"]} idle, max {usage["max"]}'
+
+  @property
+  def status_items(self) -> List[str]:
+    return [
+      ConnectionPools.pool_status(name='request', pool=self.request),
+      ConnectionPools.pool_status(name='blocking', pool=self.blocking),
+    ]
+
+  def request_client(self) -> Redis:
+    return Redis(connection_pool=self.request)
+
+  def blocking_client(self) -> Redis:
+    return Redis(connection_pool=self.blocking)
+
+  def disconnect(self):
+    self.request.disconnect()
+    self.blocking.disconnect()
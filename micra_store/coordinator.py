@@ -2,7 +2,9 @@ from __future__ import annotations
 
 import os
 import sys
+import socket
 import threading
+import selectors
 import time
 import click
 import pdb
@@ -12,19 +14,109 @@ import atexit
 import pandas as pd
 
 from enum import Enum
-from redis import Redis
-from typing import Dict, Optional, List, Callable
-from gevent.socket import wait_read
+from redis import Redis, ResponseError
+from typing import Dict, Optional, List, Callable, Set, Tuple
 from .base import retry
-from .error import MicraInputTimeout, MicraSubprocessEnded, MicraQuit
-from .structure import Element, ContentType, Structure, micra_content_types, micra_structures
+from .error import MicraSubprocessEnded, MicraQuit
+from .structure import Element, ContentType, Structure, micra_content_types, micra_structures, definition_registry
 from .command_base import Command
+from .connection import ConnectionPools
+from .metrics import metrics
+from .profile import profiled
 from queue import Queue, Empty, Full
+from concurrent.futures import ThreadPoolExecutor
 from moda.user import MenuOption, UserInteractor
 from moda.style import Styled, CustomStyled, Format, Styleds
 from moda.log import log
 from moda.process import spawn_process
 
+class SignalingQueue(Queue):
+  _read_fd: int
+  _write_fd: int
+
+  def __init__(self, maxsize: int=0):
+    super().__init__(maxsize=maxsize)
+    self._read_fd, self._write_fd = os.pipe()
+    os.set_blocking(self._read_fd, False)
+    os.set_blocking(self._write_fd, False)
+
+  def fileno(self) -> int:
+    return self._read_fd
+
+  def signal(self):
+    try:
+      os.write(self._write_fd, b'\0')
+    except BlockingIOError:
+      # the pipe is full, so a wakeup is already pending
+      pass
+
+  def clear_signals(self):
+    try:
+      while os.read(self._read_fd, 4096):
+        pass
+    except BlockingIOError:
+      pass
+
+  def _put(self, item: any):
+    super()._put(item)
+    self.signal()
+
+class QueuedCommand:
+  command: str
+  _acknowledger: Optional[Callable[[], None]]
+
+  def __init__(self, command: str, acknowledger: Optional[Callable[[], None]]=None):
+    self.command = command
+    self._acknowledger = acknowledger
+
+  def acknowledge(self):
+    if self._acknowledger:
+      self._acknowledger()
+
+class CommandStatistics:
+  count: int
+  total_seconds: float
+  max_seconds: float
+  last_seconds: float
+
+  def __init__(self):
+    self.count = 0
+    self.total_seconds = 0
+    self.max_seconds = 0
+    self.last_seconds = 0
+
+  @property
+  def mean_seconds(self) -> float:
+    return self.total_seconds / self.count if self.count else 0
+
+  def record(self, seconds: float):
+    self.count += 1
+    self.total_seconds += seconds
+    self.max_seconds = max(self.max_seconds, seconds)
+    self.last_seconds = seconds
+
+class SubprocessExit:
+  pid: int
+  command: str
+  return_code: int
+  cpu_seconds: Optional[float]
+  max_rss_kb: Optional[int]
+
+  def __init__(self, pid: int, command: str, return_code: int, cpu_seconds: Optional[float]=None, max_rss_kb: Optional[int]=None):
+    self.pid = pid
+    self.command = command
+    self.return_code = return_code
+    self.cpu_seconds = cpu_seconds
+    self.max_rss_kb = max_rss_kb
+
+  @property
+  def display_text(self) -> str:
+    usage = [
+      *([f'cpu {self.cpu_seconds:.3f}s'] if self.cpu_seconds is not None else []),
+      *([f'max rss {self.max_rss_kb} KiB'] if self.max_rss_kb is not None else []),
+    ]
+    return f'Subprocess exited: {self.command} ({self.pid}) code {self.return_code}{"".join(f", {u}" for u in usage)}'
+
 class Listener:
   _runner: Optional[Callable[[], None]]
   _cleaner: Optional[Callable[[], None]]
@@ -33,6 +125,7 @@ class Listener:
   input_queue: Queue
   output_queue: Queue
   info: Dict[str, any]
+  _info_lock: threading.Lock
 
   def __init__(self, runner: Optional[Callable[[], None]]=None, cleaner: Optional[Callable[[], None]]=None, stopper: Optional[Callable[[], bool]]=None, info: Dict[str, any]={}, name: Optional[str]=None):
     self._runner = runner
@@ -42,6 +135,7 @@ class Listener:
     self.input_queue = Queue()
     self.output_queue = Queue()
     self.info = {**info}
+    self._info_lock = threading.Lock()
 
   @property
   def runner(self) -> Callable[[], None]:
@@ -60,15 +154,21 @@ class Listener:
     if self._cleaner:
       self._cleaner()
 
+  def update_info(self, info: Dict[str, any]):
+    # unlike output_queue, which is only drained by get_info, frequent updates do not accumulate
+    with self._info_lock:
+      self.info.update(info)
+
   def get_info(self) -> Dict[str, any]:
-    try:
-      for _ in range(0, self.output_queue.qsize()):
-        info = self.output_queue.get_nowait()
-        self.output_queue.task_done()
-        self.info.update(info)
-    except Empty:
-      pass
-    return self.info
+    with self._info_lock:
+      try:
+        for _ in range(0, self.output_queue.qsize()):
+          info = self.output_queue.get_nowait()
+          self.output_queue.task_done()
+          self.info.update(info)
+      except Empty:
+        pass
+      return {**self.info}
 
 class Coordinator:
   class MonitorOption(MenuOption):
@@ -102,9 +202,11 @@ class Coordinator:
       return CustomStyled(text=self.option_text, style=style)
   
   redis: Optional[Redis] = None
+  blocking_redis: Optional[Redis] = None
+  pools: Optional[ConnectionPools] = None
   config: Dict[str, any]
   listeners: Dict[Listener, threading.Thread]
-  queue: Queue
+  queue: SignalingQueue
   pdb_enabled: bool
   dry_run: bool
   should_listen: bool
@@ -114,11 +216,23 @@ class Coordinator:
   subprocesses: Dict[int, str]
   messages: Dict[str, str]
   commands_to_run: List[str]
-
-  def __init__(self, config: Dict[str, any], pdb_enabled: bool=False, dry_run: bool=False, should_listen: bool=True, should_define: bool=True, interactive: bool=True, user: Optional[UserInteractor]=None):
+  workers: int
+  profile_directory: Optional[str]
+  profile_mode: str
+  profile_channel: Optional[str]
+  command_statistics: Dict[str, CommandStatistics]
+  subprocess_exits: Dict[int, SubprocessExit]
+  max_subprocess_exits: int=20
+  _supervised_pids: Set[int]
+  _pool: Optional[ThreadPoolExecutor]
+  _pool_commands: int
+  _statistics_lock: threading.Lock
+  _listeners_lock: threading.Lock
+
+  def __init__(self, config: Dict[str, any], pdb_enabled: bool=False, dry_run: bool=False, should_listen: bool=True, should_define: bool=True, interactive: bool=True, user: Optional[UserInteractor]=None, workers: int=0):
     self.config = config
     self.listeners = {}
-    self.queue = Queue()
+    self.queue = self.create_queue()
     self.pdb_enabled = pdb_enabled
     self.dry_run = dry_run
     self.should_listen = should_listen
@@ -129,6 +243,20 @@ class Coordinator:
     self.subprocesses = {}
     self.messages = {}
     self.commands_to_run = []
+    self.workers = workers
+    self.profile_directory = None
+    self.profile_mode = 'cprofile'
+    self.profile_channel = None
+    self.command_statistics = {}
+    self.subprocess_exits = {}
+    self._supervised_pids = set()
+    self._pool = None
+    self._pool_commands = 0
+    self._statistics_lock = threading.Lock()
+    self._listeners_lock = threading.Lock()
+
+  def create_queue(self) -> SignalingQueue:
+    return SignalingQueue()
 
   @classmethod
   def listener_status(cls, listener: Listener, thread: threading.Thread) -> str:
@@ -145,6 +273,10 @@ class Coordinator:
       status = 'dead'
     return f'Subprocess: {command} ({pid}) {status}'
 
+  @classmethod
+  def command_status(cls, name: str, statistics: CommandStatistics) -> str:
+    return f'Command: {name} ({statistics.count} runs) mean {statistics.mean_seconds:.3f}s, max {statistics.max_seconds:.3f}s, last {statistics.last_seconds:.3f}s'
+
   @classmethod
   def subprocess_command(cls, run_args: List[str]) -> str:
     return ' '.join(shlex.quote(a) for a in run_args)
@@ -159,9 +291,14 @@ class Coordinator:
 
   @property
   def listener_starters(self) -> Dict[str, Callable[[], None]]:
-    return {
-      'accept': lambda k: self.start_accept_commands(key=k),
+    starters = {
+      'accept': lambda k, prefetch=None, processing_key=None: self.start_accept_commands(key=k, prefetch=int(prefetch) if prefetch is not None else None, processing_key=processing_key),
+      'accept_many': lambda *k: self.start_accept_many_commands(keys=list(k)),
+      'subscribe': lambda *p: self.start_subscribe_commands(patterns=list(p)),
     }
+    if type(self).handle_stream_entries is not Coordinator.handle_stream_entries:
+      starters['consume'] = lambda k, group, consumer=None: self.start_consume_stream(key=k, group=group, consumer=consumer)
+    return starters
 
   @property
   def status_items(self) -> List[str]:
@@ -173,34 +310,60 @@ class Coordinator:
         'dry-run' if self.dry_run else None,
       ]))
       status.append(f'Running: {", ".join(run_states)}')
+      status.append(f'Queue: {self.queue.qsize() + len(self.commands_to_run)} waiting, {self._pool_commands} running on {self.workers} workers')
+    # status can run on a worker while the run loop adds and removes listeners and subprocesses
+    with self._listeners_lock:
+      listeners = list(self.listeners.items())
     status += [
-      Coordinator.listener_status(listener=l, thread=self.listeners[l]) 
-      for l in sorted(self.listeners.keys(), key=lambda l: l.name)
+      type(self).listener_status(listener=l, thread=t)
+      for l, t in sorted(listeners, key=lambda i: i[0].name)
     ]
     status += [
-      Coordinator.subprocess_status(pid=p, command=self.subprocesses[p])
-      for p in sorted(self.subprocesses.keys())
+      Coordinator.subprocess_status(pid=p, command=c)
+      for p, c in sorted(list(self.subprocesses.items()))
     ]
+    status += [e.display_text for e in list(self.subprocess_exits.values())]
+    if self.pools is not None:
+      status += self.pools.status_items
+    with self._statistics_lock:
+      status += [
+        Coordinator.command_status(name=n, statistics=self.command_statistics[n])
+        for n in sorted(self.command_statistics.keys())
+      ]
     status += [
-      self.messages[k]
-      for k in sorted(self.messages.keys())
+      m
+      for _, m in sorted(list(self.messages.items()))
     ]
     return status
   
   def connect(self):
-    self.redis = Redis(**self.config['redis'])
+    self.pools = ConnectionPools.from_config(config=self.config)
+    self.redis = self.pools.request_client()
+    self.blocking_redis = self.pools.blocking_client()
 
   def disconnect(self):
+    if self.pools is not None:
+      self.pools.disconnect()
+    self.pools = None
     self.redis = None
+    self.blocking_redis = None
 
   def start_listener(self, listener: Listener, force: bool=False):
     if not self.should_listen and not force:
       return
-    thread = threading.Thread(target=listener.runner)
+    def run_listener():
+      try:
+        listener.runner()
+      finally:
+        # wake the run loop so that it notices the listener ended
+        self.queue.signal()
+
+    thread = threading.Thread(target=run_listener)
     thread.setDaemon(True)
     thread.start()
     self.user.present_message(Format().cyan()(f'Starting listener {listener.name} ({thread.ident}).'))
-    self.listeners[listener] = thread
+    with self._listeners_lock:
+      self.listeners[listener] = thread
 
   def stop_listener(self, thread_id: int):
     items = list(filter(lambda i: i[1].ident == thread_id, self.listeners.items()))
@@ -211,16 +374,33 @@ class Coordinator:
 
   def start_subprocess(self, run_args: List[str], eternal: bool=False):
     process, terminator = spawn_process(run_args=run_args)
-    self.queue.put(f'subprocess {process.pid} set {shlex.quote(Coordinator.subprocess_command(run_args))}')
-    while True:
-      time.sleep(1)
-      return_code = process.poll()
-      if return_code is None:
-        continue
-      atexit.unregister(terminator)
-      self.queue.put(f'subprocess {process.pid} clear')
-      if return_code != 0 or eternal:
-        raise MicraSubprocessEnded(pid=process.pid)
+    command = Coordinator.subprocess_command(run_args)
+    self._supervised_pids.add(process.pid)
+    self.queue.put(f'subprocess {process.pid} set {shlex.quote(command)}')
+    try:
+      # block until the child exits and reap it together with its resource usage
+      _, status, rusage = os.wait4(process.pid, 0)
+    finally:
+      self._supervised_pids.discard(process.pid)
+    return_code = os.waitstatus_to_exitcode(status)
+    process.returncode = return_code
+    atexit.unregister(terminator)
+    self.record_subprocess_exit(subprocess_exit=SubprocessExit(
+      pid=process.pid,
+      command=command,
+      return_code=return_code,
+      cpu_seconds=rusage.ru_utime + rusage.ru_stime,
+      max_rss_kb=rusage.ru_maxrss
+    ))
+    self.queue.put(f'subprocess {process.pid} clear')
+    if return_code != 0 or eternal:
+      raise MicraSubprocessEnded(pid=process.pid)
+
+  def record_subprocess_exit(self, subprocess_exit: SubprocessExit):
+    self.subprocess_exits.pop(subprocess_exit.pid, None)
+    self.subprocess_exits[subprocess_exit.pid] = subprocess_exit
+    while len(self.subprocess_exits) > self.max_subprocess_exits:
+      del self.subprocess_exits[next(iter(self.subprocess_exits))]
 
   def define_structure(self, element: Element, hash: Optional[str]=None):
     if hash is None:
@@ -231,6 +411,11 @@ class Coordinator:
       else:
         raise TypeError(f'Cannot infer element hash from element type {type(element).__name__}')
     self.redis.hset(hash, element.identifier, json.dumps(element.ordered_structure_dict))
+    definition_registry.bump_version(redis=self.redis)
+
+  def match_command(self, command: str) -> Optional[Command]:
+    filtered_commands = list(filter(lambda c: c.matches_command(command=command), self.commands))
+    return filtered_commands[0] if len(filtered_commands) == 1 else None
 
   def run_command(self, command: str):
     filtered_commands = list(filter(lambda c: c.matches_command(command=command), self.commands))
@@ -241,10 +426,25 @@ class Coordinator:
       print(f'Command input matches multiple commands: {command} ({", ".join(c.name for c in filtered_commands)})')
       return
     micra_command = filtered_commands[0]
-    result = micra_command.run(command=command)
+    start = time.monotonic()
+    try:
+      if self.profile_directory is not None:
+        with profiled(directory=self.profile_directory, label=micra_command.name, mode=self.profile_mode, redis=self.redis, channel=self.profile_channel):
+          result = micra_command.run(command=command)
+      else:
+        result = micra_command.run(command=command)
+    finally:
+      self.record_command(name=micra_command.name, seconds=time.monotonic() - start)
     if result is not None:
       print(result)
 
+  def record_command(self, name: str, seconds: float):
+    with self._statistics_lock:
+      if name not in self.command_statistics:
+        self.command_statistics[name] = CommandStatistics()
+      self.command_statistics[name].record(seconds=seconds)
+    metrics.histogram('command_seconds', command=name).record(seconds)
+
   def add_subprocess(self, pid: int, command: str):
     self.subprocesses[pid] = command
     self.user.present_message(Format().cyan()(f'Adding subprocess {command} ({pid}).'))
@@ -259,18 +459,227 @@ class Coordinator:
   def remove_message(self, key: str):
     del self.messages[key]
 
-  def start_accept_commands(self, key: str):
-    r = self.redis
+  def start_accept_commands(self, key: str, prefetch: Optional[int]=None, processing_key: Optional[str]=None):
+    self.start_accept_many_commands(keys=[key], prefetch=prefetch, processing_key=processing_key)
+
+  def start_accept_many_commands(self, keys: List[str], prefetch: Optional[int]=None, processing_key: Optional[str]=None):
+    r = self.blocking_redis
+    request_redis = self.redis
     queue = self.queue
+    accept_config = self.config.get('accept', {})
+    prefetch = prefetch if prefetch is not None else accept_config.get('prefetch', 1)
+    processing_key = processing_key if processing_key is not None else accept_config.get('processing_key')
+    assert keys
+    assert prefetch > 0
+    if processing_key is not None and len(keys) > 1:
+      raise ValueError('A processing key can only be used when accepting from a single key')
+    recovered = False
+    dequeued = {k: 0 for k in keys}
+    key_names = {**{k.encode(): k for k in keys}, **{k: k for k in keys}}
+    started = time.monotonic()
+
+    def report(key_commands: List[Tuple[str, str]]):
+      for key, _ in key_commands:
+        dequeued[key] += 1
+        metrics.counter('accept_dequeued_total', key=key).increment()
+      elapsed = max(time.monotonic() - started, 1e-9)
+      listener.update_info({
+        i: v
+        for k in keys if dequeued[k]
+        for i, v in [(f'{k} dequeued', dequeued[k]), (f'{k} rate', f'{dequeued[k] / elapsed:.2f}/s')]
+      })
+
+    def pop_more(count: int) -> List[Tuple[str, str]]:
+      # fill the remaining window from the keys in priority order
+      key_commands = []
+      for key in keys:
+        if len(key_commands) == count:
+          break
+        if processing_key is None:
+          key_commands += [(key, c) for c in r.rpop(key, count - len(key_commands)) or []]
+        else:
+          pipe = r.pipeline(transaction=False)
+          for _ in range(count):
+            pipe.lmove(key, processing_key, 'RIGHT', 'LEFT')
+          key_commands += [(key, c) for c in pipe.execute() if c is not None]
+      return key_commands
 
     @retry(pdb_enabled=self.pdb_enabled, queue=queue)
     def accept_commands():
+      nonlocal recovered
+      if processing_key is not None and not recovered:
+        # requeue commands that a previous run accepted but never acknowledged, oldest last
+        while r.lmove(processing_key, keys[0], 'LEFT', 'RIGHT') is not None:
+          pass
+        recovered = True
+      # each buffered command holds a slot until it has run
+      window = threading.BoundedSemaphore(prefetch)
+
+      def acknowledger(command: str) -> Callable[[], None]:
+        def acknowledge():
+          if processing_key is not None:
+            request_redis.lrem(processing_key, 1, command)
+          window.release()
+        return acknowledge
+
       while True:
-        queue.join()
-        command = r.brpop(key)[1]
-        queue.put(command)
+        window.acquire()
+        if processing_key is None:
+          # BRPOP checks the keys in order, so earlier keys take priority
+          popped_key, command = r.brpop(keys)
+          key_commands = [(key_names[popped_key], command)]
+        else:
+          key_commands = [(keys[0], r.blmove(keys[0], processing_key, 0, 'RIGHT', 'LEFT'))]
+        count = 0
+        while count < prefetch - 1 and window.acquire(blocking=False):
+          count += 1
+        if count:
+          more = pop_more(count=count)
+          for _ in range(count - len(more)):
+            window.release()
+          key_commands += more
+        for _, command in key_commands:
+          queue.put(QueuedCommand(command=command, acknowledger=acknowledger(command)))
+        report(key_commands=key_commands)
+
+    listener = Listener(runner=accept_commands, info={
+      **({'key': keys[0]} if len(keys) == 1 else {'keys': ', '.join(keys)}),
+      'prefetch': prefetch,
+      **({'processing_key': processing_key} if processing_key is not None else {}),
+    })
+    self.start_listener(listener)
+
+  def start_subscribe_commands(self, patterns: List[str], batch_size: Optional[int]=None, max_pending: Optional[int]=None):
+    queue = self.queue
+    subscribe_config = self.config.get('subscribe', {})
+    batch_size = batch_size if batch_size is not None else subscribe_config.get('batch_size', 100)
+    max_pending = max_pending if max_pending is not None else subscribe_config.get('max_pending', 1000)
+    assert patterns
+    assert batch_size > 0
+    pubsub = self.blocking_redis.pubsub(ignore_subscribe_messages=True)
+    stopped = threading.Event()
+    totals = {'received': 0, 'dropped': 0}
+    last_drained = None
 
-    self.start_listener(Listener(runner=accept_commands, info={'key': key}))
+    @retry(pdb_enabled=self.pdb_enabled, queue=queue)
+    def subscribe_commands():
+      nonlocal last_drained
+      if not pubsub.patterns:
+        pubsub.psubscribe(*patterns)
+      while not stopped.is_set():
+        message = pubsub.get_message(timeout=1)
+        if message is None:
+          continue
+        # drain whatever else has already arrived before handing the batch over
+        messages = [message]
+        while len(messages) < batch_size:
+          message = pubsub.get_message(timeout=0)
+          if message is None:
+            break
+          messages.append(message)
+        dropped = 0
+        for message in messages:
+          if queue.qsize() >= max_pending:
+            dropped += 1
+            continue
+          queue.put(message['data'])
+        totals['received'] += len(messages)
+        totals['dropped'] += dropped
+        metrics.counter('subscribe_received_total').increment(len(messages))
+        metrics.counter('subscribe_dropped_total').increment(dropped)
+        # full batches mean that messages arrive faster than they are drained
+        drained = time.monotonic()
+        listener.update_info({
+          **totals,
+          'last_batch': len(messages),
+          'drain_interval': f'{drained - last_drained:.3f}s' if last_drained is not None else None,
+        })
+        last_drained = drained
+
+    def stop_subscribing() -> bool:
+      stopped.set()
+      return True
+
+    listener = Listener(runner=subscribe_commands, cleaner=pubsub.close, stopper=stop_subscribing, info={
+      'patterns': ', '.join(patterns),
+      'max_pending': max_pending,
+      **totals,
+    })
+    self.start_listener(listener)
+
+  def handle_stream_entries(self, key: str, group: str, entries: List[Tuple[str, Dict[str, any]]]) -> List[str]:
+    # subclasses process entries read by a consumer group and return the ids to acknowledge
+    raise NotImplementedError()
+
+  def start_consume_stream(self, key: str, group: str, consumer: Optional[str]=None, handler: Optional[Callable[[str, str, List[Tuple[str, Dict[str, any]]]], List[str]]]=None):
+    if handler is None:
+      if type(self).handle_stream_entries is Coordinator.handle_stream_entries:
+        raise NotImplementedError(f'{type(self).__name__} does not handle stream entries')
+      handler = self.handle_stream_entries
+    r = self.blocking_redis
+    request_redis = self.redis
+    consume_config = self.config.get('consume', {})
+    consumer = consumer if consumer is not None else f'{socket.gethostname()}-{os.getpid()}'
+    count = consume_config.get('count', 100)
+    block_ms = consume_config.get('block_ms', 1000)
+    claim_idle_ms = consume_config.get('claim_idle_ms', 60000)
+    claim_interval = consume_config.get('claim_interval', 30)
+    max_length = consume_config.get('max_length')
+    trim_interval = consume_config.get('trim_interval', 60)
+    stopped = threading.Event()
+    totals = {'consumed': 0, 'acknowledged': 0, 'claimed': 0}
+
+    def process(entries: List[Tuple[str, Optional[Dict[str, any]]]], claimed: bool=False):
+      # entries deleted from the stream while pending come back without fields
+      entries = [e for e in entries if e[1] is not None]
+      if not entries:
+        return
+      with metrics.timer('consume_handler_seconds', key=key, group=group):
+        acknowledged = handler(key, group, entries)
+      if acknowledged:
+        request_redis.xack(key, group, *acknowledged)
+      totals['consumed'] += len(entries)
+      metrics.counter('consume_entries_total', key=key, group=group).increment(len(entries))
+      totals['acknowledged'] += len(acknowledged)
+      if claimed:
+        totals['claimed'] += len(entries)
+      listener.update_info(totals)
+
+    @retry(pdb_enabled=self.pdb_enabled, queue=self.queue)
+    def consume_stream():
+      try:
+        r.xgroup_create(key, group, id='0', mkstream=True)
+      except ResponseError as e:
+        if 'BUSYGROUP' not in str(e):
+          raise
+      claim_id = '0-0'
+      last_claim = 0
+      last_trim = time.monotonic()
+      while not stopped.is_set():
+        now = time.monotonic()
+        if claim_idle_ms and now - last_claim >= claim_interval:
+          claim_result = request_redis.xautoclaim(key, group, consumer, min_idle_time=claim_idle_ms, start_id=claim_id, count=count)
+          claim_id = claim_result[0]
+          last_claim = now
+          process(entries=claim_result[1], claimed=True)
+        response = r.xreadgroup(group, consumer, {key: '>'}, count=count, block=block_ms)
+        for _, entries in response or []:
+          process(entries=entries)
+        if max_length is not None and now - last_trim >= trim_interval:
+          request_redis.xtrim(key, maxlen=max_length, approximate=True)
+          last_trim = now
+
+    def stop_consuming() -> bool:
+      stopped.set()
+      return True
+
+    listener = Listener(runner=consume_stream, stopper=stop_consuming, info={
+      'key': key,
+      'group': group,
+      'consumer': consumer,
+      **totals,
+    })
+    self.start_listener(listener)
 
   def update_listeners(self) -> bool:
     updated = False
@@ -283,13 +692,17 @@ class Coordinator:
           raise
         except Exception as e:
           self.user.present_message(f'An error occurred while cleaning listener {listener.name} ({thread.ident})', error=e)
-        del self.listeners[listener]
+        with self._listeners_lock:
+          del self.listeners[listener]
         updated = True
     return updated
 
   def update_subprocesses(self) -> bool:
     updated = False
     for pid in sorted(self.subprocesses.keys()):
+      if pid in self._supervised_pids:
+        # supervised subprocesses report their own exit
+        continue
       try:
         os.getpgid(pid)
       except ProcessLookupError:
@@ -299,35 +712,78 @@ class Coordinator:
     return updated
 
   def try_command(self) -> Optional[bool]:
-    command = None
+    queued_command = None
+    from_queue = False
     if self.commands_to_run:
-      command = self.commands_to_run.pop(0)
-      from_queue = False
-    elif self.listeners:
+      queued_command = QueuedCommand(command=self.commands_to_run.pop(0))
+    else:
       try:
-        command = self.queue.get(block=not self.user.interactive)
+        item = self.queue.get_nowait()
+        queued_command = item if isinstance(item, QueuedCommand) else QueuedCommand(command=item)
         from_queue = True
       except Empty:
-        pass
-    elif not self.subprocesses and not self.user.interactive:
-      self.user.present_message(Format().yellow()('Nothing to do.'))
-      return False
-    if command is None:
+        if not self.listeners and not self.subprocesses and not self.user.interactive:
+          self.user.present_message(Format().yellow()('Nothing to do.'))
+          return False
+    if queued_command is None:
       return None
+    command = queued_command.command
+    if self._pool is not None:
+      micra_command = self.match_command(command=command)
+      if micra_command is not None and micra_command.can_run_concurrently(command=command):
+        with self._statistics_lock:
+          self._pool_commands += 1
+        self._pool.submit(self.run_concurrent_command, queued_command=queued_command, from_queue=from_queue)
+        return True
     try:
       self.run_command(command=command)
     except (KeyboardInterrupt, SystemExit):
       raise
     except MicraQuit:
+      self.finish_command(queued_command=queued_command, from_queue=False)
       return False
     except Exception as e:
       self.user.present_message(message=f'Error running command: {command}', error=e)
       if self.pdb_enabled:
         pdb.post_mortem()
+    self.finish_command(queued_command=queued_command, from_queue=from_queue)
+    return True
+
+  def run_concurrent_command(self, queued_command: QueuedCommand, from_queue: bool):
+    try:
+      self.run_command(command=queued_command.command)
+    except Exception as e:
+      self.user.present_message(message=f'Error running command: {queued_command.command}', error=e)
+    finally:
+      with self._statistics_lock:
+        self._pool_commands -= 1
+      self.finish_command(queued_command=queued_command, from_queue=from_queue)
+      sys.stdout.flush()
+
+  def finish_command(self, queued_command: QueuedCommand, from_queue: bool):
+    try:
+      queued_command.acknowledge()
+    except (KeyboardInterrupt, SystemExit):
+      raise
+    except Exception as e:
+      self.user.present_message(message=f'Error acknowledging command: {queued_command.command}', error=e)
     if from_queue:
       self.queue.task_done()
+
+  def read_user_command(self) -> bool:
+    line = sys.stdin.readline()
+    if not line:
+      return False
+    user_command = line.strip()
+    if user_command:
+      self.commands_to_run.append(user_command)
     return True
 
+  @property
+  def wait_timeout(self) -> Optional[float]:
+    # the liveness of subprocesses started elsewhere can only be polled
+    return 1 if set(self.subprocesses.keys()) - self._supervised_pids else None
+
   def start(self):
     assert not self.running
 
@@ -338,33 +794,42 @@ class Coordinator:
 
     self.running = True
     should_print_menu = True
+    if self.workers:
+      self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='micra_command')
+    selector = selectors.DefaultSelector()
+    selector.register(self.queue, selectors.EVENT_READ)
     if self.user.interactive:
       self.user.present_message(Format().green()('Starting in interactive mode.'))
-    next_update = time.time() + 1
-    while True:
-      if next_update < time.time():
+      selector.register(sys.stdin, selectors.EVENT_READ)
+    try:
+      while True:
         should_print_menu = self.update_listeners() or should_print_menu
         should_print_menu = self.update_subprocesses() or should_print_menu
-        next_update = time.time() + 1
 
-      command_result = self.try_command()
-      sys.stdout.flush()
-      sys.stderr.flush()
-      if command_result is True:
-        should_print_menu = True
-      elif command_result is False:
-        break
-      if self.user.interactive:
-        try:
-          if should_print_menu:
-            self.user.present_message('\n'.join(c.display_styled.styled for c in self.commands if c.can_run))
-            print('µ—>', end=' ')
-            sys.stdout.flush()
-          wait_read(sys.stdin.fileno(), timeout=0.01, timeout_exc=MicraInputTimeout)
-          user_command = sys.stdin.readline().strip()
-          if user_command:
-            self.commands_to_run.append(user_command)
-        except MicraInputTimeout:
+        command_result = self.try_command()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        if command_result is True:
+          should_print_menu = True
+          continue
+        elif command_result is False:
+          break
+
+        if self.user.interactive and should_print_menu:
+          self.user.present_message('\n'.join(c.display_styled.styled for c in self.commands if c.can_run))
+          print('µ—>', end=' ')
+          sys.stdout.flush()
           should_print_menu = False
-
-    self.running = False
+        for key, _ in selector.select(timeout=self.wait_timeout):
+          if key.fileobj is self.queue:
+            self.queue.clear_signals()
+          elif not self.read_user_command():
+            selector.unregister(sys.stdin)
+            self.user.present_message(Format().yellow()('Input closed, continuing non-interactively.'))
+            self.user.interactive = False
+    finally:
+      selector.close()
+      if self._pool is not None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = None
+      self.running = False
@@ -0,0 +1,28 @@
+import pandas as pd
+
+from typing import List, Dict
+
+class FrameAccumulator:
+  _frames: List[pd.DataFrame]
+
+  def __init__(self, frames: List[pd.DataFrame]=[]):
+    self._frames = []
+    for frame in frames:
+      self.add(frame)
+
+  def __len__(self) -> int:
+    return sum(len(f) for f in self._frames)
+
+  def add(self, data_frame: pd.DataFrame):
+    # frames without rows or columns contribute nothing to the result
+    if data_frame.empty and not len(data_frame.columns):
+      return
+    self._frames.append(data_frame)
+
+  def add_records(self, records: List[Dict[str, any]]):
+    self.add(pd.DataFrame(records))
+
+  def frame(self) -> pd.DataFrame:
+    if not self._frames:
+      return pd.DataFrame()
+    return pd.concat(self._frames, sort=False)
@@ -1,10 +1,98 @@
-import json
 import datetime
 
-from .resource import Resource
+from redis import Redis
+from redis.commands.core import Script
 from typing import Dict, List, Optional
+from .resource import Resource, Field, JSONCodec, DateTimeCodec
+from .structure.job_structures import jobs_scored, jobs_ready, jobs_active, jobs_ready_almacen
+
+# KEYS: scored, active. ARGV: score/member pairs.
+score_script_source = '''
+local added = 0
+for i = 1, #ARGV, 2 do
+  added = added + redis.call('ZADD', KEYS[1], ARGV[i], ARGV[i + 1])
+  redis.call('SADD', KEYS[2], ARGV[i + 1])
+end
+return added
+'''
+
+# KEYS: scored, ready, active, stream. ARGV: count, max stream length (0 for no trimming).
+# Members are the names of their job hashes. The script only touches its declared keys, so
+# dispatch_jobs stamps the hashes with ran afterwards.
+dispatch_script_source = '''
+local popped = redis.call('ZPOPMAX', KEYS[1], ARGV[1])
+local max_length = tonumber(ARGV[2])
+local members = {}
+for i = 1, #popped, 2 do
+  local member = popped[i]
+  redis.call('SADD', KEYS[2], member)
+  redis.call('SADD', KEYS[3], member)
+  if max_length > 0 then
+    redis.call('XADD', KEYS[4], 'MAXLEN', '~', max_length, '*', 'job', member)
+  else
+    redis.call('XADD', KEYS[4], '*', 'job', member)
+  end
+  members[#members + 1] = member
+end
+return members
+'''
+
+# KEYS: ready, active, job. ARGV: finished, result (empty to leave unset).
+finish_script_source = '''
+local removed = redis.call('SREM', KEYS[1], KEYS[3])
+redis.call('SREM', KEYS[2], KEYS[3])
+redis.call('HSET', KEYS[3], 'finished', ARGV[1])
+if ARGV[2] ~= '' then
+  redis.call('HSET', KEYS[3], 'result', ARGV[2])
+end
+return removed
+'''
+
+job_script_sources = {
+  'score': score_script_source,
+  'dispatch': dispatch_script_source,
+  'finish': finish_script_source,
+}
+job_scripts: Dict[str, Script] = {}
+
+def get_job_script(redis: Redis, name: str) -> Script:
+  if name not in job_scripts:
+    job_scripts[name] = redis.register_script(job_script_sources[name])
+  return job_scripts[name]
+
+# the structure keys default to the shared job structures and only differ for isolated queues such as in tests
+def score_jobs(redis: Redis, scores: Dict[str, float], scored_key: str=jobs_scored.key, active_key: str=jobs_active.key) -> int:
+  args = [v for name, score in scores.items() for v in (score, name)]
+  if not args:
+    return 0
+  return get_job_script(redis=redis, name='score')(keys=[scored_key, active_key], args=args, client=redis)
+
+def dispatch_jobs(redis: Redis, count: int=1, ran: Optional[datetime.datetime]=None, max_stream_length: int=0, scored_key: str=jobs_scored.key, ready_key: str=jobs_ready.key, active_key: str=jobs_active.key, stream_key: str=jobs_ready_almacen.key) -> List[str]:
+  assert count > 0
+  ran = ran if ran is not None else datetime.datetime.now(datetime.timezone.utc)
+  members = get_job_script(redis=redis, name='dispatch')(
+    keys=[scored_key, ready_key, active_key, stream_key],
+    args=[count, max_stream_length],
+    client=redis
+  )
+  if members:
+    pipe = redis.pipeline()
+    for member in members:
+      pipe.hset(member, 'ran', ran.isoformat())
+    pipe.execute()
+  return members
+
+def finish_job(redis: Redis, name: str, finished: Optional[datetime.datetime]=None, result: Optional[str]=None, ready_key: str=jobs_ready.key, active_key: str=jobs_active.key) -> bool:
+  finished = finished if finished is not None else datetime.datetime.now(datetime.timezone.utc)
+  return bool(get_job_script(redis=redis, name='finish')(
+    keys=[ready_key, active_key, name],
+    args=[finished.isoformat(), result if result is not None else ''],
+    client=redis
+  ))
 
 class Job(Resource):
+  __slots__ = ()
+
   @property
   def _version_name(self) -> str:
     return type(self).name_from_components(type(self).components_form_name(self._name)[:-1])
@@ -13,86 +101,16 @@ class Job(Resource):
   def _job_name(self) -> str:
     return type(self).name_from_components(type(self).components_form_name(self._name)[:-2])
 
-  @property
-  def source(self) -> str:
-    return self._get_key('source')
-
-  @property
-  def realm(self) -> str:
-    return self._get_key('realm')
-
-  @realm.setter
-  def realm(self, value: str):
-    return self._set_key('realm', value)
-
-  @property
-  def company(self) -> str:
-    return self._get_key('company')
-
-  @property
-  def action(self) -> str:
-    return self._get_key('action')
-
-  @property
-  def target(self) -> str:
-    return self._get_key('target')
-
-  @property
-  def objective(self) -> str:
-    return self._get_key('objective')
-
-  @property
-  def version(self) -> str:
-    return self._get_key('version')
-
-  @property
-  def configuration(self) -> Optional[any]:
-    json_value = self._get_key('configuration', optional=True)
-    return json.loads(json_value) if json_value is not None else None
-
-  @configuration.setter
-  def configuration(self, value: Optional[any]):
-    self._set_key('configuration', json.dumps(value) if value is not None else value)
-
-  @property
-  def created(self) -> datetime.datetime:
-    raw_value = self._get_key('created', optional=True)
-    return datetime.datetime.fromisoformat(raw_value) if raw_value else None
-
-  @created.setter
-  def created(self, value: datetime.datetime):
-    self._set_key('created', value.isoformat())
-
-  @property
-  def ran(self) -> datetime.datetime:
-    raw_value = self._get_key('ran', optional=True)
-    return datetime.datetime.fromisoformat(raw_value) if raw_value else None
-
-  @ran.setter
-  def ran(self, value: datetime.datetime):
-    self._set_key('ran', value.isoformat())
-
-  @property
-  def finished(self) -> datetime.datetime:
-    raw_value = self._get_key('finished', optional=True)
-    return datetime.datetime.fromisoformat(raw_value) if raw_value else None
-
-  @finished.setter
-  def finished(self, value: datetime.datetime):
-    self._set_key('finished', value.isoformat())
-
-  @property
-  def result(self) -> Optional[str]:
-    return self._get_key('result', optional=True)
-
-  @result.setter
-  def result(self, value: Optional[str]):
-    self._set_key('result', value)
-
-  @property
-  def host(self) -> Optional[str]:
-    return self._get_key('host', optional=True)
-
-  @host.setter
-  def host(self, value: Optional[str]):
-    self._set_key('host', value)
\ No newline at end of file
+  source = Field(read_only=True)
+  realm = Field()
+  company = Field(read_only=True)
+  action = Field(read_only=True)
+  target = Field(read_only=True)
+  objective = Field(read_only=True)
+  version = Field(read_only=True)
+  configuration = Field(codec=JSONCodec(), optional=True)
+  created = Field(codec=DateTimeCodec(), optional=True)
+  ran = Field(codec=DateTimeCodec(), optional=True)
+  finished = Field(codec=DateTimeCodec(), optional=True)
+  result = Field(optional=True)
+  host = Field(optional=True)
@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import os
+import math
+import time
+import threading
+
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple, Iterator
+
+Labels = Tuple[Tuple[str, str], ...]
+
+class Counter:
+  value: float
+  _lock: threading.Lock
+
+  def __init__(self):
+    self.value = 0
+    self._lock = threading.Lock()
+
+  def increment(self, amount: float=1):
+    with self._lock:
+      self.value += amount
+
+  def snapshot(self) -> Dict[str, any]:
+    return {'value': self.value}
+
+class Gauge:
+  value: float
+  _lock: threading.Lock
+
+  def __init__(self):
+    self.value = 0
+    self._lock = threading.Lock()
+
+  def set(self, value: float):
+    self.value = value
+
+  def increment(self, amount: float=1):
+    with self._lock:
+      self.value += amount
+
+  def decrement(self, amount: float=1):
+    self.increment(-amount)
+
+  def snapshot(self) -> Dict[str, any]:
+    return {'value': self.value}
+
+class Histogram:
+  # buckets split every power of two above lowest into sub_bucket_count linear steps, as HdrHistogram does,
+  # so recorded values keep a relative precision of 1 / sub_bucket_count
+  lowest: float
+  sub_bucket_count: int
+  count: int
+  total: float
+  min: Optional[float]
+  max: Optional[float]
+  _buckets: Dict[int, int]
+  _lock: threading.Lock
+
+  def __init__(self, lowest: float=1e-6, sub_bucket_count: int=16):
+    assert lowest > 0 and sub_bucket_count > 0
+    self.lowest = lowest
+    self.sub_bucket_count = sub_bucket_count
+    self.count = 0
+    self.total = 0
+    self.min = None
+    self.max = None
+    self._buckets = {}
+    self._lock = threading.Lock()
+
+  def bucket_index(self, value: float) -> int:
+    scaled = value / self.lowest
+    if scaled < 1:
+      return 0
+    exponent = int(math.log2(scaled))
+    sub_bucket = min(int((scaled / 2 ** exponent - 1) * self.sub_bucket_count), self.sub_bucket_count - 1)
+    return 1 + exponent * self.sub_bucket_count + sub_bucket
+
+  def bucket_upper_bound(self, index: int) -> float:
+    if index == 0:
+      return self.lowest
+    exponent, sub_bucket = divmod(index - 1, self.sub_bucket_count)
+    return self.lowest * 2 ** exponent * (1 + (sub_bucket + 1) / self.sub_bucket_count)
+
+  def record(self, value: float):
+    index = self.bucket_index(value=value)
+    with self._lock:
+      self._buckets[index] = self._buckets.get(index, 0) + 1
+      self.count += 1
+      self.total += value
+      self.min = value if self.min is None else min(self.min, value)
+      self.max = value if self.max is None else max(self.max, value)
+
+  @contextmanager
+  def time(self) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.record(time.perf_counter() - start)
+
+  @property
+  def mean(self) -> float:
+    return self.total / self.count if self.count else 0
+
+  def cumulative_buckets(self) -> List[Tuple[float, int]]:
+    with self._lock:
+      buckets = sorted(self._buckets.items())
+    cumulative = []
+    running = 0
+    for index, count in buckets:
+      running += count
+      cumulative.append((self.bucket_upper_bound(index=index), running))
+    return cumulative
+
+  def percentile(self, percentile: float) -> float:
+    if not self.count:
+      return 0
+    threshold = self.count * percentile / 100
+    for upper_bound, running in self.cumulative_buckets():
+      if running >= threshold:
+        return min(upper_bound, self.max)
+    return self.max
+
+  def snapshot(self) -> Dict[str, any]:
+    return {
+      'count': self.count,
+      'sum': self.total,
+      'min': self.min,
+      'mean': self.mean,
+      'p50': self.percentile(50),
+      'p90': self.percentile(90),
+      'p99': self.percentile(99),
+      'max': self.max,
+    }
+
+metric_types = {
+  Counter: 'counter',
+  Gauge: 'gauge',
+  Histogram: 'histogram',
+}
+
+class MetricsRegistry:
+  _metrics: Dict[Tuple[str, Labels], any]
+  _lock: threading.Lock
+
+  def __init__(self):
+    self._metrics = {}
+    self._lock = threading.Lock()
+
+  def _get(self, metric_type: type, name: str, labels: Dict[str, any]) -> any:
+    key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+    metric = self._metrics.get(key)
+    if metric is None:
+      with self._lock:
+        metric = self._metrics.setdefault(key, metric_type())
+    assert isinstance(metric, metric_type)
+    return metric
+
+  def counter(self, name: str, **labels) -> Counter:
+    return self._get(metric_type=Counter, name=name, labels=labels)
+
+  def gauge(self, name: str, **labels) -> Gauge:
+    return self._get(metric_type=Gauge, name=name, labels=labels)
+
+  def histogram(self, name: str, **labels) -> Histogram:
+    return self._get(metric_type=Histogram, name=name, labels=labels)
+
+  def timer(self, name: str, **labels):
+    return self.histogram(name, **labels).time()
+
+  def reset(self):
+    with self._lock:
+      self._metrics = {}
+
+  def items(self) -> List[Tuple[str, Labels, any]]:
+    with self._lock:
+      return [(n, l, m) for (n, l), m in sorted(self._metrics.items(), key=lambda i: i[0])]
+
+  def snapshot(self) -> List[Dict[str, any]]:
+    return [
+      {
+        'name': name,
+        'type': metric_types[type(metric)],
+        'labels': dict(labels),
+        **metric.snapshot(),
+      }
+      for name, labels, metric in self.items()
+    ]
+
+  @classmethod
+  def prometheus_labels(cls, labels: Labels, extra: Labels=()) -> str:
+    all_labels = labels + extra
+    if not all_labels:
+      return ''
+    pairs = []
+    for key, value in all_labels:
+      escaped = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+      pairs.append(f'{key}="{escaped}"')
+    return '{' + ','.join(pairs) + '}'
+
+  def prometheus_text(self, prefix: str='micra_') -> str:
+    lines = []
+    typed = set()
+    for name, labels, metric in self.items():
+      full_name = f'{prefix}{name}'
+      if full_name not in typed:
+        lines.append(f'# TYPE {full_name} {metric_types[type(metric)]}')
+        typed.add(full_name)
+      label_text = MetricsRegistry.prometheus_labels(labels=labels)
+      if isinstance(metric, Histogram):
+        for upper_bound, running in metric.cumulative_buckets():
+          lines.append(f'{full_name}_bucket{MetricsRegistry.prometheus_labels(labels=labels, extra=(("le", repr(upper_bound)),))} {running}')
+        lines.append(f'{full_name}_bucket{MetricsRegistry.prometheus_labels(labels=labels, extra=(("le", "+Inf"),))} {metric.count}')
+        lines.append(f'{full_name}_sum{label_text} {metric.total}')
+        lines.append(f'{full_name}_count{label_text} {metric.count}')
+      else:
+        lines.append(f'{full_name}{label_text} {metric.value}')
+    return '\n'.join(lines) + '\n'
+
+  def write_prometheus(self, path: str, prefix: str='micra_'):
+    # write beside the target and rename so that scrapers never read a partial file
+    temporary_path = f'{path}.{os.getpid()}.tmp'
+    with open(temporary_path, 'w') as f:
+      f.write(self.prometheus_text(prefix=prefix))
+    os.replace(temporary_path, path)
+
+metrics = MetricsRegistry()
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import os
+import re
+import sys
+import json
+import time
+import pstats
+import cProfile
+import itertools
+import threading
+
+from collections import Counter
+from contextlib import contextmanager
+from redis import Redis
+from typing import Dict, List, Optional, Iterator
+
+class Profiler:
+  name: str = ''
+  extension: str = ''
+
+  def start(self):
+    raise NotImplementedError()
+
+  def stop(self):
+    raise NotImplementedError()
+
+  def write(self, path: str):
+    raise NotImplementedError()
+
+  def top_frames(self, limit: int=20) -> List[Dict[str, any]]:
+    raise NotImplementedError()
+
+class CProfileProfiler(Profiler):
+  name = 'cprofile'
+  extension = '.pstats'
+  _profile: cProfile.Profile
+
+  def __init__(self):
+    self._profile = cProfile.Profile()
+
+  def start(self):
+    self._profile.enable()
+
+  def stop(self):
+    self._profile.disable()
+
+  def write(self, path: str):
+    self._profile.dump_stats(path)
+
+  def top_frames(self, limit: int=20) -> List[Dict[str, any]]:
+    stats = pstats.Stats(self._profile).stats
+    ordered = sorted(stats.items(), key=lambda i: i[1][3], reverse=True)[:limit]
+    return [
+      {
+        'frame': f'{file}:{line}:{function}',
+        'calls': calls,
+        'total_seconds': total,
+        'cumulative_seconds': cumulative,
+      }
+      for (file, line, function), (_, calls, total, cumulative, _) in ordered
+    ]
+
+class SamplingProfiler(Profiler):
+  # samples the stack of the thread that started it, which costs far less than tracing every call
+  name = 'sampling'
+  extension = '.collapsed'
+  interval: float
+  stacks: Counter
+  _thread_id: Optional[int]
+  _stopped: threading.Event
+  _sampler: Optional[threading.Thread]
+
+  def __init__(self, interval: float=0.005):
+    self.interval = interval
+    self.stacks = Counter()
+    self._thread_id = None
+    self._stopped = threading.Event()
+    self._sampler = None
+
+  def start(self):
+    self._thread_id = threading.get_ident()
+    self._sampler = threading.Thread(target=self._sample, daemon=True)
+    self._sampler.start()
+
+  def _sample(self):
+    while not self._stopped.wait(self.interval):
+      frame = sys._current_frames().get(self._thread_id)
+      stack = []
+      while frame is not None:
+        stack.append(f'{frame.f_code.co_filename}:{frame.f_code.co_name}')
+        frame = frame.f_back
+      if stack:
+        self.stacks[';'.join(reversed(stack))] += 1
+
+  def stop(self):
+    self._stopped.set()
+    self._sampler.join()
+
+  def write(self, path: str):
+    with open(path, 'w') as f:
+      for stack, count in self.stacks.most_common():
+        f.write(f'{stack} {count}\n')
+
+  def top_frames(self, limit: int=20) -> List[Dict[str, any]]:
+    leaves = Counter()
+    for stack, count in self.stacks.items():
+      leaves[stack.rsplit(';', 1)[-1]] += count
+    return [{'frame': f, 'samples': c} for f, c in leaves.most_common(limit)]
+
+profilers = {
+  CProfileProfiler.name: CProfileProfiler,
+  SamplingProfiler.name: SamplingProfiler,
+}
+
+# profiles of the same command within one second would otherwise share a path
+_profile_sequence = itertools.count()
+
+def profile_path(directory: str, label: str, extension: str) -> str:
+  safe_label = re.sub(r'[^\w.-]+', '_', label).strip('_') or 'command'
+  return os.path.join(directory, f'{safe_label}-{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}-{threading.get_ident()}-{next(_profile_sequence)}{extension}')
+
+# profilers of different threads would see each other's calls, so only one profile runs at a time
+_profiling_lock = threading.Lock()
+_active = threading.local()
+
+@contextmanager
+def profiled(directory: str, label: str, mode: str=CProfileProfiler.name, redis: Optional[Redis]=None, channel: Optional[str]=None, limit: int=20) -> Iterator[Profiler]:
+  active_profiler = getattr(_active, 'profiler', None)
+  if active_profiler is not None:
+    # a command profiled by the coordinator and by its own option is only recorded by the outer profile
+    yield active_profiler
+    return
+  with _profiling_lock:
+    profiler = profilers[mode]()
+    profiler.start()
+    _active.profiler = profiler
+    try:
+      yield profiler
+    finally:
+      profiler.stop()
+      _active.profiler = None
+      os.makedirs(directory, exist_ok=True)
+      path = profile_path(directory=directory, label=label, extension=profiler.extension)
+      profiler.write(path=path)
+      if redis is not None and channel is not None:
+        redis.publish(channel, json.dumps({
+          'label': label,
+          'mode': mode,
+          'path': path,
+          'top_frames': profiler.top_frames(limit=limit),
+        }))
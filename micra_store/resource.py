@@ -1,12 +1,121 @@
+from __future__ import annotations
+
 import re
+import json
+import datetime
 
 from redis import Redis, WatchError
-from typing import List, Dict, Optional
+from redis.commands.core import Script
+from typing import List, Dict, Optional, Tuple, FrozenSet
+
+# KEYS[1] is the hash. ARGV holds the check, set and delete counts, a replace flag, the
+# check field/value pairs, the set field/value pairs and the fields to delete.
+put_script_source = '''
+local key = KEYS[1]
+local check_count = tonumber(ARGV[1])
+local set_count = tonumber(ARGV[2])
+local delete_count = tonumber(ARGV[3])
+local index = 5
+for i = 1, check_count do
+  if redis.call('HGET', key, ARGV[index]) ~= ARGV[index + 1] then
+    return 0
+  end
+  index = index + 2
+end
+if ARGV[4] == '1' then
+  redis.call('DEL', key)
+end
+local batch = 500
+for start = 0, set_count - 1, batch do
+  local stop = math.min(start + batch, set_count) - 1
+  redis.call('HSET', key, unpack(ARGV, index + start * 2, index + stop * 2 + 1))
+end
+index = index + set_count * 2
+for start = 0, delete_count - 1, batch do
+  local stop = math.min(start + batch, delete_count) - 1
+  redis.call('HDEL', key, unpack(ARGV, index + start, index + stop))
+end
+return 1
+'''
+
+class FieldCodec:
+  # decoded values that can be changed in place are compared with the stored value before writing
+  mutable: bool = False
+
+  def decode(self, raw_value: any) -> any:
+    return raw_value
+
+  def encode(self, value: any) -> any:
+    return value
+
+class StringCodec(FieldCodec):
+  pass
+
+class JSONCodec(FieldCodec):
+  mutable = True
+
+  def decode(self, raw_value: any) -> any:
+    return json.loads(raw_value)
+
+  def encode(self, value: any) -> str:
+    return json.dumps(value)
+
+class DateTimeCodec(FieldCodec):
+  def decode(self, raw_value: any) -> Optional[datetime.datetime]:
+    if isinstance(raw_value, bytes):
+      raw_value = raw_value.decode()
+    return datetime.datetime.fromisoformat(raw_value) if raw_value else None
+
+  def encode(self, value: datetime.datetime) -> str:
+    return value.isoformat()
+
+class Field:
+  key: Optional[str]
+  codec: FieldCodec
+  optional: bool
+  read_only: bool
+
+  def __init__(self, codec: FieldCodec=StringCodec(), optional: bool=False, read_only: bool=False, key: Optional[str]=None):
+    self.key = key
+    self.codec = codec
+    self.optional = optional
+    self.read_only = read_only
+
+  def __set_name__(self, owner: type, name: str):
+    if self.key is None:
+      self.key = name
+
+  def __get__(self, instance: Optional[Resource], owner: type) -> any:
+    if instance is None:
+      return self
+    decoded = instance._decoded
+    if self.key not in decoded:
+      raw_value = instance._get_key(self.key, optional=self.optional)
+      decoded[self.key] = self.codec.decode(raw_value) if raw_value is not None else None
+    return decoded[self.key]
+
+  def __set__(self, instance: Resource, value: any):
+    if self.read_only:
+      raise AttributeError(f'{self.key} is read-only')
+    instance._set_key(self.key, self.codec.encode(value) if value is not None else None, optional=self.optional)
+    if value is not None:
+      instance._decoded[self.key] = value
 
 class Resource:
-  _name: str=''
-  _contents: Dict[str, any]={}
+  __slots__ = ('_name', '_contents', '_loaded_contents', '_decoded')
+  _name: str
+  _contents: Dict[str, any]
+  _loaded_contents: Optional[Dict[str, any]]
+  _decoded: Dict[str, any]
   _optional_attributes: List[str]=[]
+  _put_script: Optional[Script]=None
+  _class_attributes: FrozenSet[str]=frozenset()
+  _fields: Dict[str, Field]={}
+
+  def __init_subclass__(cls, **kwargs):
+    super().__init_subclass__(**kwargs)
+    cls._class_attributes = frozenset(n for k in cls.__mro__ for n in vars(k))
+    cls._fields = {f.key: f for k in reversed(cls.__mro__) for f in vars(k).values() if isinstance(f, Field)}
 
   @classmethod
   def escaped_name_component(cls, component: str):
@@ -26,15 +135,111 @@ class Resource:
 
   def __init__(self, name: str='', contents: Dict[str, any]={}):
     self._name = name
+    self._loaded_contents = None
+    self._decoded = {}
     self._contents = {}
     self._contents.update(contents)
 
-  def _get(self, redis: Redis):
-    contents = redis.hgetall(self._name)
+  @classmethod
+  def _get_put_script(cls, redis: Redis) -> Script:
+    if Resource._put_script is None:
+      Resource._put_script = redis.register_script(put_script_source)
+    return Resource._put_script
+
+  def _load(self, contents: Optional[Dict[str, any]]):
     self._contents = contents if contents is not None else {}
+    # the snapshot shares the loaded hash until the first change copies the contents
+    self._loaded_contents = self._contents
+    self._decoded = {}
     return self
 
-  def _put(self, redis: Optional[Redis]=None, check_map: Optional[Dict[str, str]]=None, pipe: Optional[any]=None) -> bool:
+  def _get(self, redis: Redis):
+    return self._load(contents=redis.hgetall(self._name))
+
+  @classmethod
+  def get_many(cls, redis: Redis, names: List[str]) -> List[Resource]:
+    pipe = redis.pipeline(transaction=False)
+    for name in names:
+      pipe.hgetall(name)
+    return [cls(name=n)._load(contents=c) for n, c in zip(names, pipe.execute())]
+
+  @classmethod
+  def put_many(cls, redis: Redis, resources: List[Resource], check_maps: Optional[List[Optional[Dict[str, str]]]]=None) -> List[bool]:
+    if check_maps is None:
+      check_maps = [None] * len(resources)
+    assert len(check_maps) == len(resources)
+    pipe = redis.pipeline(transaction=False)
+    for resource, check_map in zip(resources, check_maps):
+      resource._queue_put_script(client=pipe, check_map=check_map)
+    results = pipe.execute(raise_on_error=False)
+    successes = []
+    for resource, result in zip(resources, results):
+      success = not isinstance(result, Exception) and bool(result)
+      if success:
+        resource._mark_clean()
+      successes.append(success)
+    return successes
+
+  def _encode_decoded(self):
+    # cached values such as JSON objects may have been changed in place since they were decoded
+    for key, value in list(self._decoded.items()):
+      field = self._fields.get(key)
+      if field is None or not field.codec.mutable or value is None:
+        continue
+      raw_value = self._contents.get(key)
+      encoded = field.codec.encode(value)
+      if encoded != raw_value and (raw_value is None or field.codec.decode(raw_value) != value):
+        self._set_key(key, encoded, optional=True)
+        self._decoded[key] = value
+
+  @property
+  def _changes(self) -> Tuple[Dict[str, any], List[str]]:
+    self._encode_decoded()
+    if self._loaded_contents is None:
+      return {**self._contents}, []
+    loaded = self._loaded_contents
+    if loaded is self._contents:
+      return {}, []
+    changed = {k: v for k, v in self._contents.items() if k not in loaded or loaded[k] != v}
+    deleted = [k for k in loaded if k not in self._contents]
+    return changed, deleted
+
+  def _write(self, pipe: any):
+    changed, deleted = self._changes
+    if self._loaded_contents is None:
+      # without a snapshot from _get the stored hash is replaced
+      pipe.delete(self._name)
+    if deleted:
+      pipe.hdel(self._name, *deleted)
+    if changed:
+      pipe.hset(self._name, mapping=changed)
+
+  def _put_script_args(self, check_map: Optional[Dict[str, str]]=None) -> List[any]:
+    changed, deleted = self._changes
+    check_map = check_map if check_map is not None else {}
+    return [
+      len(check_map),
+      len(changed),
+      len(deleted),
+      1 if self._loaded_contents is None else 0,
+      *(v for i in check_map.items() for v in i),
+      *(v for i in changed.items() for v in i),
+      *deleted,
+    ]
+
+  def _queue_put_script(self, client: any, check_map: Optional[Dict[str, str]]=None) -> any:
+    return type(self)._get_put_script(redis=client)(keys=[self._name], args=self._put_script_args(check_map=check_map), client=client)
+
+  def _mark_clean(self):
+    self._loaded_contents = self._contents
+
+  def _put(self, redis: Optional[Redis]=None, check_map: Optional[Dict[str, str]]=None, pipe: Optional[any]=None, use_script: bool=False) -> bool:
+    if use_script:
+      assert redis is not None
+      if not self._queue_put_script(client=redis, check_map=check_map):
+        return False
+      self._mark_clean()
+      return True
     if pipe is None:
       assert redis is not None
       pipe = redis.pipeline()
@@ -46,12 +251,12 @@ class Resource:
         if check_values[index] != check_map[key]:
           return False
       pipe.multi()
-    pipe.delete(self._name)
-    pipe.hmset(self._name, self._contents)
+    self._write(pipe=pipe)
     try:
       pipe.execute()
     except WatchError:
       return False
+    self._mark_clean()
     return True
 
   def _get_key(self, key: str, optional: bool=False) -> Optional[any]:
@@ -63,26 +268,30 @@ class Resource:
       raise ValueError(None)
 
   def _set_key(self, key: str, value: Optional[any], optional: bool=False):
+    self._decoded.pop(key, None)
+    if self._contents is self._loaded_contents:
+      self._contents = {**self._contents}
     if value is None:
       if not optional:
         raise ValueError(None)
       else:
-        del self._contents[key]
+        self._contents.pop(key, None)
     else:
       self._contents[key] = value
 
-  def __getattribute__(self, name):
-    try:
-      return object.__getattribute__(self, name)
-    except AttributeError:
-      value = self._get_key(key=name, optional=True)
-      if value is not None or name in self._optional_attributes:
-        return value
-      raise
+  def __getattr__(self, name):
+    # only reached for names that are not instance or class attributes, i.e. dynamic hash fields
+    if name.startswith('_'):
+      raise AttributeError(name)
+    value = self._get_key(key=name, optional=True)
+    if value is not None or name in self._optional_attributes:
+      return value
+    raise AttributeError(name)
 
   def __setattr__(self, name, value):
-    try:
-      object.__getattribute__(self, name)
+    if name.startswith('_') or name in self._class_attributes:
       object.__setattr__(self, name, value)
-    except (AttributeError, ValueError):
-      self._set_key(key=name, value=value, optional=name in self._optional_attributes)
\ No newline at end of file
+    else:
+      self._set_key(key=name, value=value, optional=name in self._optional_attributes)
+
+Resource._class_attributes = frozenset(vars(Resource))
@@ -1,3 +1,5 @@
-from .base import Element, ContentConverter, ContentType, StructureType, Structure, Value, Hash, Set, OrderedSet, List, Join
+from .base import ordered_representation, range_indices, Element, ContentConverter, RecordColumns, ContentType, StructureType, Structure, Value, Hash, Set, OrderedSet, List, Stream, Join
 from .common_structures import json_type, json_object_type, micra_command, micra_content_types, micra_structures, micra_definitions, micra_structures_with_types, micra_commands
 from .job_structures import job_identifier, job_version, job_instance, job_appointment, jobs_active, jobs_ready, jobs_ready_almacen, jobs_scored
+from .registry import DefinitionRegistry, definition_registry, definitions_version_key
+from .decoding import JSONDecoder, StandardJSONDecoder, OrjsonDecoder, json_decoders, get_json_decoder, set_json_decoder
@@ -1,15 +1,19 @@
 from __future__ import annotations
-import json
+import copy
+import time
 import pandas as pd
 
 from enum import Enum
 from redis import Redis
 from redis.client import Pipeline
-from typing import Dict, Set as SetType, OrderedDict as OrderedDictType, Union, List as ListType, Optional, Tuple
+from typing import Dict, Set as SetType, OrderedDict as OrderedDictType, Union, List as ListType, Optional, Tuple, Iterable, Iterator
 from collections import OrderedDict
 from functools import reduce
 from pprint import pformat
 from ..resource import Resource
+from ..frame import FrameAccumulator
+from ..metrics import metrics
+from .decoding import get_json_decoder
 from moda.style import CustomStyled, Styleds, Format
 
 def ordered_representation(representation: any) -> any:
@@ -22,6 +26,35 @@ def ordered_representation(representation: any) -> any:
   else:
     return representation
 
+default_page_size = 1000
+
+def next_stream_id(stream_id: Union[bytes, str]) -> str:
+  text = stream_id.decode() if isinstance(stream_id, bytes) else stream_id
+  milliseconds, sequence = text.split('-')
+  return f'{milliseconds}-{int(sequence) + 1}'
+
+def range_bounds(length: int, content_range: Tuple[Optional[int], Optional[int]]) -> Tuple[int, int]:
+  start, stop = content_range
+  start = 0 if start is None else max(length + start, 0) if start < 0 else min(start, length)
+  end = length if stop is None else max(length + stop + 1, 0) if stop < 0 else min(stop + 1, length)
+  return start, end
+
+def range_indices(length: int, ranges: ListType[Tuple[Optional[int], Optional[int]]]) -> ListType[int]:
+  return list(sorted(reduce(lambda s, r: s.union(range(*range_bounds(length=length, content_range=r))), ranges, set())))
+
+
+def timed_pages(pages: Iterator[any], structure_type: StructureType) -> Iterator[any]:
+  # time each read on its own so that consumers of the pages are not counted
+  histogram = metrics.histogram('redis_read_seconds', structure_type=structure_type.value)
+  while True:
+    start = time.perf_counter()
+    try:
+      page = next(pages)
+    except StopIteration:
+      return
+    histogram.record(time.perf_counter() - start)
+    yield page
+
 class Definition:
   @classmethod
   def from_dict(cls, representation: Dict[str, any]) -> Definition:
@@ -74,7 +107,7 @@ class Element(Definition):
   def display_metadata(self, redis: Union[Redis, Pipeline]) -> str:
     return ''
 
-  def display_detail(self, redis: Union[Redis, Pipeline]) -> str:
+  def display_detail(self, redis: Redis) -> str:
     return ''
 
   @property
@@ -104,16 +137,31 @@ class ContentConverter(Enum):
     else:
       return False
 
+  @property
+  def converts_scalar(self) -> bool:
+    if self is ContentConverter.string or self is ContentConverter.json:
+      return True
+    else:
+      return False
+
   def convert_instance(self, serialization: any) -> any:
     if self is ContentConverter.string:
       return serialization
     elif self is ContentConverter.dictionary:
       return serialization
     elif self is ContentConverter.json or self is ContentConverter.json_object:
-      return json.loads(serialization)
+      return get_json_decoder().loads(serialization)
     elif self is ContentConverter.resource:
       return Resource(contents=serialization)
 
+  def convert_instances(self, serializations: ListType[any]) -> ListType[any]:
+    if self is ContentConverter.string or self is ContentConverter.dictionary:
+      return serializations
+    elif self is ContentConverter.json or self is ContentConverter.json_object:
+      return get_json_decoder().loads_many(serializations)
+    else:
+      return [self.convert_instance(s) for s in serializations]
+
   def instance_dict(self, instance: any) -> Dict[str, any]:
     if self is ContentConverter.string or self is ContentConverter.json:
       return {'': instance}
@@ -124,6 +172,45 @@ class ContentConverter(Enum):
     elif self is ContentConverter.resource:
       return instance._contents
 
+class RecordColumns:
+  identifier: str
+  columns: OrderedDictType[str, ListType[any]]
+  length: int
+  _column_names: Dict[str, str]
+
+  def __init__(self, identifier: str):
+    self.identifier = identifier
+    self.columns = OrderedDict()
+    self.length = 0
+    self._column_names = {}
+
+  def column_name(self, name: str) -> str:
+    if name not in self._column_names:
+      self._column_names[name] = self.identifier if not name else name[1:] if name.startswith('.') else f'{self.identifier}.{name}'
+    return self._column_names[name]
+
+  def column(self, name: str, length: int) -> ListType[any]:
+    if name not in self.columns:
+      self.columns[name] = [None] * length
+    column = self.columns[name]
+    if len(column) < length:
+      column.extend([None] * (length - len(column)))
+    return column
+
+  def extend(self, count: int, fixed_columns: Dict[str, Iterable[any]]={}, instance_dicts: Optional[Iterable[Dict[str, any]]]=None):
+    for name, values in fixed_columns.items():
+      self.column(name=name, length=self.length).extend(values)
+    if instance_dicts is not None:
+      for row, instance_dict in enumerate(instance_dicts, start=self.length):
+        for name, value in instance_dict.items():
+          self.column(name=name, length=row).append(value)
+    self.length += count
+    for name in self.columns:
+      self.column(name=name, length=self.length)
+
+  def data_frame(self) -> pd.DataFrame:
+    return pd.DataFrame(OrderedDict((self.column_name(n), c) for n, c in self.columns.items()))
+
 class ContentType(Element):
   _properties: Dict[str, str]
   _converter: ContentConverter
@@ -195,6 +282,103 @@ class StructureType(Enum):
     else:
       raise NotImplementedError()
 
+  def iterate_content(self, key: str, redis: Redis, page_size: int=default_page_size, deduplicate: bool=False) -> Iterator[any]:
+    if self is StructureType.list or self is StructureType.ordered_set:
+      # index windows keep the list and score order of the whole structure
+      start = 0
+      while True:
+        if self is StructureType.list:
+          page = redis.lrange(key, start, start + page_size - 1)
+        else:
+          page = redis.zrange(key, start, start + page_size - 1, withscores=True)
+        if page:
+          yield page
+        if len(page) < page_size:
+          return
+        start += page_size
+    elif self is StructureType.set or self is StructureType.hash:
+      scan = redis.sscan if self is StructureType.set else redis.hscan
+      # a scan may return a member more than once if the structure is resized while it runs;
+      # remembering every member costs memory in proportion to the structure, so only callers
+      # that keep the whole content anyway ask for it
+      seen = set() if deduplicate else None
+      cursor = 0
+      while True:
+        cursor, page = scan(key, cursor=cursor, count=page_size)
+        if seen is not None:
+          if self is StructureType.hash:
+            page = {k: v for k, v in page.items() if k not in seen}
+            seen.update(page.keys())
+          else:
+            page = [m for m in page if m not in seen]
+            seen.update(page)
+        if page:
+          yield page
+        if not cursor:
+          return
+    elif self is StructureType.stream:
+      start = '-'
+      while True:
+        page = redis.xrange(key, min=start, max='+', count=page_size)
+        if page:
+          # match the shape of an XREAD reply
+          yield [[key, page]]
+        if len(page) < page_size:
+          return
+        start = next_stream_id(page[-1][0])
+    else:
+      raise NotImplementedError()
+
+  def supports_range(self, start: Optional[int], stop: Optional[int]) -> bool:
+    if self is StructureType.list or self is StructureType.ordered_set:
+      return True
+    elif self is StructureType.stream:
+      # XRANGE can only count entries from the start of the stream
+      return (start is None or start >= 0) and stop is not None and stop >= 0
+    else:
+      return False
+
+  def read_content_range(self, key: str, redis: Union[Redis, Pipeline], start: Optional[int], stop: Optional[int]) -> any:
+    # on a pipeline this only queues the read, so the reply is shaped by shape_content_range afterwards
+    start = 0 if start is None else start
+    if self is StructureType.list:
+      return redis.lrange(key, start, -1 if stop is None else stop)
+    elif self is StructureType.ordered_set:
+      return redis.zrange(key, start, -1 if stop is None else stop, withscores=True)
+    elif self is StructureType.stream:
+      assert self.supports_range(start=start, stop=stop)
+      return redis.xrange(key, count=stop + 1)
+    else:
+      raise NotImplementedError()
+
+  def shape_content_range(self, key: str, content: any, start: Optional[int]) -> any:
+    if self is StructureType.stream:
+      # match the shape of an XREAD reply
+      return [[key, content[0 if start is None else start:]]]
+    return content
+
+  def select_content_range(self, content: any, content_range: Tuple[Optional[int], Optional[int]]) -> any:
+    # applies a range that could not be pushed down to Redis to a full get_content reply
+    if self is StructureType.hash:
+      items = list(content.items())
+      return {items[i][0]: items[i][1] for i in range_indices(length=len(items), ranges=[content_range])}
+    elif self is StructureType.set:
+      members = list(content)
+      return {members[i] for i in range_indices(length=len(members), ranges=[content_range])}
+    elif self is StructureType.stream:
+      return [[k, [entries[i] for i in range_indices(length=len(entries), ranges=[content_range])]] for k, entries in content]
+    else:
+      return [content[i] for i in range_indices(length=len(content), ranges=[content_range])]
+
+  def get_content_range(self, key: str, redis: Redis, start: Optional[int], stop: Optional[int]) -> any:
+    return self.shape_content_range(key=key, content=self.read_content_range(key=key, redis=redis, start=start, stop=stop), start=start)
+
+  def page_length(self, page: any) -> int:
+    if self is StructureType.stream:
+      return len(page[0][1])
+    else:
+      return len(page)
+
   def convert_to_records(self, content: any, converter: ContentConverter) -> ListType[Dict[str, any]]:
     if converter.converts_collection:
       return [converter.instance_dict(converter.convert_instance(content))]
@@ -211,6 +395,30 @@ class StructureType(Enum):
     else:
       raise NotImplementedError()
 
+  def convert_to_columns(self, content: any, converter: ContentConverter, columns: RecordColumns):
+    if converter.converts_collection:
+      columns.extend(count=1, instance_dicts=[converter.instance_dict(converter.convert_instance(content))])
+      return
+    elif self is StructureType.list or self is StructureType.set:
+      fixed_columns = {}
+      members = list(content)
+    elif self is StructureType.ordered_set:
+      fixed_columns = {'.ordered_set_score': [s for _, s in content]}
+      members = [m for m, _ in content]
+    elif self is StructureType.hash:
+      fixed_columns = {'.hash_key': list(content.keys())}
+      members = list(content.values())
+    elif self is StructureType.stream:
+      fixed_columns = {'.stream_id': [k for k, _ in content[0][1]]}
+      members = [d for _, d in content[0][1]]
+    else:
+      raise NotImplementedError()
+    instances = converter.convert_instances(members)
+    if converter.converts_scalar:
+      columns.extend(count=len(instances), fixed_columns={**fixed_columns, '': instances})
+    else:
+      columns.extend(count=len(instances), fixed_columns=fixed_columns, instance_dicts=map(converter.instance_dict, instances))
+
 class Join(Definition):
   structure: str
   select: ListType[str]
@@ -249,17 +457,18 @@ class Join(Definition):
     }
   
   def get_structure(self, redis: Union[Redis, Pipeline]) -> Structure:
-    from .common_structures import micra_structures
-    return Structure.from_dict(json.loads(redis.hget(micra_structures.key, self.structure)))
+    from .registry import definition_registry
+    return definition_registry.get_structure(identifier=self.structure, redis=redis)
 
   def join(self, data_frame: pd.DataFrame, redis: Union[Redis, Pipeline]) -> pd.DataFrame:
     structure = self.get_structure(redis=redis)
     assert len(self.key_on) == len(structure.key_tokens)
     if self.key_on:
       keys_data_frame = data_frame.groupby(self.key_on).size().reset_index()
-      join_data_frame = pd.DataFrame()
-      for r in keys_data_frame.iterrows():
-        join_data_frame = join_data_frame.append(structure.with_tokens(tokens=[r[1][t] for t in self.key_on]).get_data_frame(redis=redis))
+      tokens = list(keys_data_frame[self.key_on].itertuples(index=False, name=None))
+      join_data_frame = structure.get_tokens_data_frame(tokens=tokens, redis=redis)
+    elif self.can_push_down_ranges(data_frame=data_frame, structure=structure):
+      join_data_frame = structure.with_content_range(content_range=self.ranges[0]).get_data_frame(redis=redis)
     else:
       join_data_frame = structure.get_data_frame(redis=redis)
     for column in self.select:
@@ -281,7 +490,7 @@ class Join(Definition):
       joined.drop('key_0', axis=1, inplace=True)
     else:
       # pass sort=False to silence a pandas warning about future behavior
-      joined = data_frame.append(join_data_frame, sort=False)
+      joined = FrameAccumulator(frames=[data_frame, join_data_frame]).frame()
 
     if self.sort:
       sort_columns = [s[0] for s in self.sort]
@@ -291,18 +500,22 @@ class Join(Definition):
           joined[column] = None
       joined.sort_values(by=sort_columns, ascending=sort_ascending, inplace=True)
     joined.reset_index(inplace=True)
-    if self.ranges:
-      joined_length = len(joined)
-      indices = reduce(lambda s, r : s.union(set(range(0 if r[0] is None else joined_length + r[0] if r[0] < 0 else r[0], joined_length if r[1] is None else joined_length + r[1] + 1 if r[1] < 0 else r[1] + 1))), self.ranges, set())
-      joined = joined.iloc[list(sorted(indices))]
+    if self.ranges and not self.can_push_down_ranges(data_frame=data_frame, structure=structure):
+      joined = joined.iloc[range_indices(length=len(joined), ranges=self.ranges)]
     return joined
 
+  def can_push_down_ranges(self, data_frame: pd.DataFrame, structure: Structure) -> bool:
+    # the range can be answered by Redis only when it applies to the joined structure's own content
+    return len(self.ranges) == 1 and data_frame.empty and bool(structure.key) and not structure.joins and not self.key_on and not self.on and not self.sort
+
 class Structure(Element):
   _key: str
   _structure_type: StructureType
   _content_type: str
   _key_tokens: ListType[str]
   _joins: ListType[Join]
+  _page_size: Optional[int]
+  _content_range: Optional[Tuple[Optional[int], Optional[int]]]
 
   def __init__(self, identifier: str, title: str, description: str, key: str, structure_type: StructureType, content_type: str, tags: SetType[str]=set(), key_tokens: ListType[str]=[], joins: ListType[Join]=[]):
     super().__init__(identifier=identifier, title=title, description=description, tags=tags)
@@ -311,6 +524,8 @@ class Structure(Element):
     self._content_type = content_type
     self._key_tokens = [*key_tokens]
     self._joins = [*joins]
+    self._page_size = default_page_size
+    self._content_range = None
 
   @classmethod
   def from_dict(cls, representation: Dict[str, any]) -> Structure:
@@ -339,6 +554,14 @@ class Structure(Element):
   def joins(self) -> ListType[Join]:
     return self._joins
 
+  @property
+  def page_size(self) -> Optional[int]:
+    return self._page_size
+
+  @property
+  def content_range(self) -> Optional[Tuple[Optional[int], Optional[int]]]:
+    return self._content_range
+
   @property
   def structure_dict(self) -> Dict[str, any]:
     return {
@@ -353,6 +576,16 @@ class Structure(Element):
   def with_key(self, key: str) -> Structure:
     return type(self).from_dict(representation={**self.structure_dict, 'key': key, 'key_tokens': []})
 
+  def with_page_size(self, page_size: Optional[int]) -> Structure:
+    structure = copy.copy(self)
+    structure._page_size = page_size
+    return structure
+
+  def with_content_range(self, content_range: Optional[Tuple[Optional[int], Optional[int]]]) -> Structure:
+    structure = copy.copy(self)
+    structure._content_range = content_range
+    return structure
+
   def with_tokens(self, tokens: ListType[str]) -> str:
     return self.with_key(key=self.key_from_tokens(tokens=tokens))
 
@@ -361,8 +594,8 @@ class Structure(Element):
     return self.key.format(*tokens)
 
   def get_content_type(self, redis: Union[Redis, Pipeline]) -> ContentType:
-    from .common_structures import micra_content_types
-    return ContentType.from_dict(json.loads(redis.hget(micra_content_types.key, self.content_type)))
+    from .registry import definition_registry
+    return definition_registry.get_content_type(identifier=self.content_type, redis=redis)
 
   def get_metadata(self, redis: Union[Redis, Pipeline]) -> Dict[str, any]:
     assert not self.key_tokens
@@ -372,51 +605,192 @@ class Structure(Element):
     assert not self.key_tokens
     return self.structure_type.get_content(key=self.key, redis=redis)
 
-  def get_data_frame(self, redis: Union[Redis, Pipeline]) -> pd.DataFrame:
+  @property
+  def can_push_down_content_range(self) -> bool:
+    return self.content_range is not None and self.structure_type.supports_range(*self.content_range)
+
+  def get_content_range(self, redis: Redis, start: Optional[int], stop: Optional[int]) -> any:
+    assert not self.key_tokens
+    return self.structure_type.get_content_range(key=self.key, redis=redis, start=start, stop=stop)
+
+  def iterate_content(self, redis: Redis, page_size: Optional[int], deduplicate: bool=False) -> Iterator[any]:
+    assert not self.key_tokens
+    if self.can_push_down_content_range:
+      yield self.get_content_range(redis=redis, start=self.content_range[0], stop=self.content_range[1])
+    elif page_size is None:
+      yield self.get_content(redis=redis)
+    else:
+      start, stop = self.content_range if self.content_range is not None else (None, None)
+      # without a member order any leading members satisfy a non-negative range
+      limit = stop + 1 if (start is None or start >= 0) and stop is not None and stop >= 0 else None
+      length = 0
+      for page in self.structure_type.iterate_content(key=self.key, redis=redis, page_size=page_size if limit is None else min(page_size, limit), deduplicate=deduplicate):
+        yield page
+        length += self.structure_type.page_length(page)
+        if limit is not None and length >= limit:
+          return
+
+  def get_data_frame(self, redis: Redis) -> pd.DataFrame:
     content_type = self.get_content_type(redis=redis)
     df = pd.DataFrame()
     if self.key:
+      # collection converters need the whole structure at once
+      page_size = None if content_type.converter.converts_collection else self.page_size
+      pages = timed_pages(pages=self.iterate_content(redis=redis, page_size=page_size, deduplicate=True), structure_type=self.structure_type)
+      df = self.convert_to_data_frame(pages=pages, content_type=content_type, key=self.key)
+      if self.content_range is not None and not self.can_push_down_content_range:
+        df = df.iloc[range_indices(length=len(df), ranges=[self.content_range])]
+    df = self.join_data_frame(data_frame=df, redis=redis)
+    if self.content_range is not None and not self.key:
+      df = df.iloc[range_indices(length=len(df), ranges=[self.content_range])]
+    return df
+
+  def iterate_data_frames(self, redis: Redis) -> Iterator[pd.DataFrame]:
+    content_type = self.get_content_type(redis=redis)
+    if not self.key or self.joins or content_type.converter.converts_collection or (self.content_range is not None and not self.can_push_down_content_range):
+      yield self.get_data_frame(redis=redis)
+      return
+    pages = timed_pages(pages=self.iterate_content(redis=redis, page_size=self.page_size), structure_type=self.structure_type)
+    while True:
       try:
-        content = self.get_content(redis=redis)
-        records = self.structure_type.convert_to_records(content=content, converter=content_type.converter)
+        page = next(pages)
+      except StopIteration:
+        return
       except (KeyboardInterrupt, SystemExit):
         raise
       except Exception as e:
-        records = [{
-          '.error_context': 'content',
-          '.error': repr(e),
-        }]
-      if records:
-        df = pd.DataFrame(records).rename(lambda c: content_type.identifier if not c else c[1:] if c.startswith('.') else  f'{content_type.identifier}.{c}', axis='columns')
-        df.insert(0, 'key', self.key)
+        page = e
+      df = self.convert_to_data_frame(pages=[page], content_type=content_type, key=self.key)
+      if not df.empty:
+        yield df
+      if isinstance(page, Exception):
+        return
+
+  def get_tokens_data_frame(self, tokens: ListType[Tuple[str, ...]], redis: Redis) -> pd.DataFrame:
+    content_type = self.get_content_type(redis=redis)
+    keys = [self.key_from_tokens(tokens=t) for t in tokens]
+    pipe = redis.pipeline(transaction=False)
+    for key in keys:
+      self.structure_type.get_content(key=key, redis=pipe)
+    with metrics.timer('redis_pipeline_seconds', operation='tokens'):
+      contents = pipe.execute(raise_on_error=False) if keys else []
+    accumulator = FrameAccumulator()
+    for key, content in zip(keys, contents):
+      df = self.convert_to_data_frame(pages=[content], content_type=content_type, key=key)
+      if self.joins:
+        df = self.with_key(key=key).join_data_frame(data_frame=df, redis=redis)
+      accumulator.add(df)
+    return accumulator.frame()
+
+  def convert_to_data_frame(self, pages: Iterable[any], content_type: ContentType, key: str) -> pd.DataFrame:
+    columns = RecordColumns(identifier=content_type.identifier)
+    histogram = metrics.histogram('convert_seconds', content_type=content_type.identifier)
+    try:
+      for content in pages:
+        # pipelined reads return errors in place of content
+        if isinstance(content, Exception):
+          raise content
+        with histogram.time():
+          self.structure_type.convert_to_columns(content=content, converter=content_type.converter, columns=columns)
+    except (KeyboardInterrupt, SystemExit):
+      raise
+    except Exception as e:
+      columns = RecordColumns(identifier=content_type.identifier)
+      columns.extend(count=1, fixed_columns={
+        '.error_context': ['content'],
+        '.error': [repr(e)],
+      })
+    if not columns.length:
+      return pd.DataFrame()
+    df = columns.data_frame()
+    df.insert(0, 'key', key)
+    return df
+
+  def join_data_frame(self, data_frame: pd.DataFrame, redis: Union[Redis, Pipeline]) -> pd.DataFrame:
+    df = data_frame
     for index, join in enumerate(self.joins):
       try:
-        df = join.join(data_frame=df, redis=redis)
+        with metrics.timer('join_seconds', structure=join.structure):
+          df = join.join(data_frame=df, redis=redis)
       except (KeyboardInterrupt, SystemExit):
         raise
       except Exception as e:
-        df = df.append([{
+        accumulator = FrameAccumulator(frames=[df])
+        accumulator.add_records([{
           'error_context': f'join:{index}',
           'error': repr(e),
         }])
+        df = accumulator.frame()
     return df
 
   @property
   def display_summary(self) -> str:
     return f'{super().display_summary} {self.key} > {self.structure_type.value} > {self.content_type} + ({", ".join(j.structure for j in self.joins)})'
 
-  def display_metadata(self, redis: Union[Redis, Pipeline]) -> str:
-    if not self.key or self.key_tokens:
-      return '()'
-    metadata_text = ', '.join(f'{m}: {v}' for m, v in self.get_metadata(redis=redis).items())
+  @property
+  def has_content(self) -> bool:
+    return bool(self.key) and not self.key_tokens
+
+  def read_display_content(self, redis: Union[Redis, Pipeline]) -> any:
+    if self.can_push_down_content_range:
+      return self.structure_type.read_content_range(key=self.key, redis=redis, start=self.content_range[0], stop=self.content_range[1])
+    return self.get_content(redis=redis)
+
+  def shape_display_content(self, content: any) -> any:
+    if self.can_push_down_content_range:
+      return self.structure_type.shape_content_range(key=self.key, content=content, start=self.content_range[0])
+    if self.content_range is not None:
+      return self.structure_type.select_content_range(content=content, content_range=self.content_range)
+    return content
+
+  def get_display_content(self, redis: Redis) -> any:
+    return self.shape_display_content(content=self.read_display_content(redis=redis))
+
+  @classmethod
+  def format_metadata(cls, metadata: Dict[str, any]) -> str:
+    metadata_text = ', '.join(f'{m}: {v}' for m, v in metadata.items())
     return f'({metadata_text})'
 
-  def display_detail(self, redis: Union[Redis, Pipeline]) -> str:
+  def format_detail(self, content: any) -> str:
     if not self.key:
       return 'No key'
     if self.key_tokens:
       return f'Token key {self.key_from_tokens(tokens=[f"{{{t}}}" for t in self.key_tokens])}'
-    return pformat(self.get_content(redis=redis))
+    return pformat(content)
+
+  def display_metadata(self, redis: Union[Redis, Pipeline]) -> str:
+    if not self.has_content:
+      return '()'
+    return type(self).format_metadata(metadata=self.get_metadata(redis=redis))
+
+  def display_detail(self, redis: Redis) -> str:
+    return self.format_detail(content=self.get_display_content(redis=redis) if self.has_content else None)
+
+  @classmethod
+  def get_displays(cls, structures: ListType[Structure], redis: Redis) -> ListType[Tuple[str, str]]:
+    pipe = redis.pipeline(transaction=False)
+    metadata_names = []
+    for structure in structures:
+      if structure.has_content:
+        # the metadata values are queued in the order of the dictionary keys
+        metadata_names.append(list(structure.get_metadata(redis=pipe).keys()))
+        structure.read_display_content(redis=pipe)
+      else:
+        metadata_names.append(None)
+    with metrics.timer('redis_pipeline_seconds', operation='displays'):
+      results = iter(pipe.execute(raise_on_error=False))
+    displays = []
+    for structure, names in zip(structures, metadata_names):
+      if names is None:
+        displays.append(('()', structure.format_detail(content=None)))
+        continue
+      metadata = {n: next(results) for n in names}
+      content = next(results)
+      displays.append((
+        cls.format_metadata(metadata={n: repr(v) if isinstance(v, Exception) else v for n, v in metadata.items()}),
+        repr(content) if isinstance(content, Exception) else structure.format_detail(content=structure.shape_display_content(content=content)),
+      ))
+    return displays
 
   def display_content(self, redis: Union[Redis, Pipeline]) -> str:
     description = Styleds(parts=[
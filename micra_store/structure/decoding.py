@@ -0,0 +1,61 @@
+import json
+
+from typing import List, Union
+
+try:
+  import orjson
+except ImportError:
+  orjson = None
+
+Serialization = Union[bytes, str]
+
+class JSONDecoder:
+  @property
+  def name(self) -> str:
+    raise NotImplementedError()
+
+  def loads(self, serialization: Serialization) -> any:
+    raise NotImplementedError()
+
+  def loads_many(self, serializations: List[Serialization]) -> List[any]:
+    return list(map(self.loads, serializations))
+
+class StandardJSONDecoder(JSONDecoder):
+  @property
+  def name(self) -> str:
+    return 'json'
+
+  def loads(self, serialization: Serialization) -> any:
+    return json.loads(serialization)
+
+class OrjsonDecoder(JSONDecoder):
+  @property
+  def name(self) -> str:
+    return 'orjson'
+
+  def loads(self, serialization: Serialization) -> any:
+    try:
+      return orjson.loads(serialization)
+    except orjson.JSONDecodeError:
+      # orjson rejects some documents the standard library accepts, such as NaN or integers wider than 64 bits
+      return json.loads(serialization)
+
+  def loads_many(self, serializations: List[Serialization]) -> List[any]:
+    try:
+      return list(map(orjson.loads, serializations))
+    except orjson.JSONDecodeError:
+      return list(map(self.loads, serializations))
+
+json_decoders = {
+  d.name: d
+  for d in [StandardJSONDecoder(), *([OrjsonDecoder()] if orjson is not None else [])]
+}
+
+_json_decoder: JSONDecoder = json_decoders['orjson'] if 'orjson' in json_decoders else json_decoders['json']
+
+def get_json_decoder() -> JSONDecoder:
+  return _json_decoder
+
+def set_json_decoder(decoder: Union[JSONDecoder, str]):
+  global _json_decoder
+  _json_decoder = json_decoders[decoder] if isinstance(decoder, str) else decoder
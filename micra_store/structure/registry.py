@@ -0,0 +1,102 @@
+from __future__ import annotations
+import json
+import time
+import threading
+
+from redis import Redis
+from typing import Dict, Optional, List as ListType
+from .base import Element, ContentType, Structure
+
+definitions_version_key = 'micra_definitions_version'
+
+class DefinitionRegistry:
+  check_interval: float
+  _version: Optional[bytes]
+  _next_check: float
+  _raw_content_types: Dict[str, bytes]
+  _raw_structures: Dict[str, bytes]
+  _content_types: Dict[str, ContentType]
+  _structures: Dict[str, Structure]
+  _lock: threading.RLock
+
+  def __init__(self, check_interval: float=1.0):
+    self.check_interval = check_interval
+    self._lock = threading.RLock()
+    self.invalidate()
+
+  @classmethod
+  def identifier_key(cls, identifier: any) -> str:
+    return identifier.decode() if isinstance(identifier, bytes) else identifier
+
+  def invalidate(self):
+    with self._lock:
+      self._version = None
+      self._next_check = 0
+      self._raw_content_types = None
+      self._raw_structures = None
+      self._content_types = {}
+      self._structures = {}
+
+  def bump_version(self, redis: Redis) -> int:
+    self.invalidate()
+    return redis.incr(definitions_version_key)
+
+  def validate(self, redis: Redis):
+    with self._lock:
+      now = time.monotonic()
+      if self._raw_structures is not None and now < self._next_check:
+        return
+      if self._raw_structures is None or redis.get(definitions_version_key) != self._version:
+        self.load(redis=redis)
+      self._next_check = now + self.check_interval
+
+  def load(self, redis: Redis):
+    from .common_structures import micra_content_types, micra_structures
+    with self._lock:
+      pipe = redis.pipeline()
+      pipe.get(definitions_version_key)
+      pipe.hgetall(micra_content_types.key)
+      pipe.hgetall(micra_structures.key)
+      version, raw_content_types, raw_structures = pipe.execute()
+      self._version = version
+      self._raw_content_types = {self.identifier_key(k): v for k, v in raw_content_types.items()}
+      self._raw_structures = {self.identifier_key(k): v for k, v in raw_structures.items()}
+      self._content_types = {}
+      self._structures = {}
+
+  def _get_element(self, identifier: str, hash: str, raw_elements: Dict[str, bytes], elements: Dict[str, Element], element_type: type, redis: Redis) -> Element:
+    if identifier in elements:
+      return elements[identifier]
+    if identifier not in raw_elements:
+      # definitions written without bumping the version counter are fetched directly
+      raw_element = redis.hget(hash, identifier)
+      if raw_element is None:
+        raise KeyError(f'No definition for {identifier} in {hash}')
+      raw_elements[identifier] = raw_element
+    element = element_type.from_dict(json.loads(raw_elements[identifier]))
+    elements[identifier] = element
+    return element
+
+  def get_content_type(self, identifier: str, redis: Redis) -> ContentType:
+    from .common_structures import micra_content_types
+    with self._lock:
+      self.validate(redis=redis)
+      return self._get_element(identifier=identifier, hash=micra_content_types.key, raw_elements=self._raw_content_types, elements=self._content_types, element_type=ContentType, redis=redis)
+
+  def get_structure(self, identifier: str, redis: Redis) -> Structure:
+    from .common_structures import micra_structures
+    with self._lock:
+      self.validate(redis=redis)
+      return self._get_element(identifier=identifier, hash=micra_structures.key, raw_elements=self._raw_structures, elements=self._structures, element_type=Structure, redis=redis)
+
+  def get_content_types(self, redis: Redis) -> ListType[ContentType]:
+    with self._lock:
+      self.validate(redis=redis)
+      return [self.get_content_type(identifier=i, redis=redis) for i in list(self._raw_content_types.keys())]
+
+  def get_structures(self, redis: Redis) -> ListType[Structure]:
+    with self._lock:
+      self.validate(redis=redis)
+      return [self.get_structure(identifier=i, redis=redis) for i in list(self._raw_structures.keys())]
+
+definition_registry = DefinitionRegistry()
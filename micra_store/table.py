@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import pandas as pd
+
+from redis import Redis
+from typing import List, Dict, Iterator, Sequence
+from .resource import Resource, Field
+from .job import Job
+
+def is_missing(value: any) -> bool:
+  return value is None or (isinstance(value, float) and value != value)
+
+class ResourceTable:
+  resource_type: type = Resource
+  names: List[str]
+  columns: Dict[str, Sequence[any]]
+
+  def __init__(self, names: List[str]=[], columns: Dict[str, Sequence[any]]={}):
+    self.names = list(names)
+    self.columns = {**columns}
+    assert all(len(c) == len(self.names) for c in self.columns.values())
+
+  def __len__(self) -> int:
+    return len(self.names)
+
+  def __getitem__(self, index: int) -> Resource:
+    return self.resource(index=index)
+
+  def __iter__(self) -> Iterator[Resource]:
+    return (self.resource(index=i) for i in range(len(self)))
+
+  def _column_list(self, name: str) -> List[any]:
+    column = self.columns.get(name)
+    if column is None:
+      column = [None] * len(self.names)
+    elif not isinstance(column, list):
+      # columns taken from a data frame are only copied once rows are appended
+      column = list(column)
+    self.columns[name] = column
+    return column
+
+  def append_contents(self, name: str, contents: Dict[str, any]):
+    for key in contents:
+      if key not in self.columns:
+        self._column_list(key)
+    self.names.append(name)
+    for key in self.columns:
+      self._column_list(key).append(contents.get(key))
+
+  def append(self, resource: Resource):
+    self.append_contents(name=resource._name, contents=resource._contents)
+
+  def extend(self, resources: List[Resource]):
+    for resource in resources:
+      self.append(resource)
+
+  @classmethod
+  def from_resources(cls, resources: List[Resource]) -> ResourceTable:
+    table = cls()
+    table.extend(resources)
+    return table
+
+  @classmethod
+  def get_many(cls, redis: Redis, names: List[str]) -> ResourceTable:
+    pipe = redis.pipeline(transaction=False)
+    for name in names:
+      pipe.hgetall(name)
+    table = cls()
+    for name, contents in zip(names, pipe.execute()):
+      table.append_contents(name=name, contents=contents if contents is not None else {})
+    return table
+
+  def column(self, name: str) -> Sequence[any]:
+    return self.columns[name]
+
+  def decoded_column(self, name: str) -> List[any]:
+    field = getattr(self.resource_type, name, None)
+    if not isinstance(field, Field):
+      return list(self.columns[name])
+    return [field.codec.decode(v) if not is_missing(v) else None for v in self.columns[field.key]]
+
+  def resource(self, index: int) -> Resource:
+    contents = {k: c[index] for k, c in self.columns.items() if not is_missing(c[index])}
+    return self.resource_type(name=self.names[index], contents=contents)
+
+  def to_data_frame(self) -> pd.DataFrame:
+    # list columns are converted to arrays once here, array columns taken from a frame are used without a copy
+    return pd.DataFrame(self.columns, index=pd.Index(self.names, name='name'), copy=False)
+
+  @classmethod
+  def from_data_frame(cls, data_frame: pd.DataFrame) -> ResourceTable:
+    return cls(
+      names=[str(n) for n in data_frame.index],
+      columns={str(c): data_frame[c].to_numpy() for c in data_frame.columns}
+    )
+
+class JobTable(ResourceTable):
+  resource_type: type = Job
@@ -0,0 +1,123 @@
+import time
+import asyncio
+import threading
+
+from environments import environment
+from ..async_coordinator import AsyncCommandQueue, AsyncCoordinator
+from ..coordinator import Listener
+from ..base import uuid
+from ..error import MicraQuit, MicraSubprocessEnded
+from .base import client
+
+class QuittingCoordinator(AsyncCoordinator):
+  def __init__(self, *args, **kwargs):
+    super().__init__(*args, **kwargs)
+    self.ran = []
+
+  def run_command(self, command: str):
+    self.ran.append(command.decode() if isinstance(command, bytes) else command)
+    raise MicraQuit()
+
+class StreamCoordinator(QuittingCoordinator):
+  def handle_stream_entries(self, key, group, entries):
+    for _, fields in entries:
+      self.queue.put(next(iter(fields.values())))
+    return [i for i, _ in entries]
+
+def run_until_quit(coordinator: AsyncCoordinator, timeout: float=10):
+  thread = threading.Thread(target=coordinator.start, daemon=True)
+  thread.start()
+  thread.join(timeout)
+  assert not thread.is_alive()
+
+def test_async_command_queue():
+  queue = AsyncCommandQueue()
+  queue.put('before')
+
+  async def consume():
+    queue.bind(loop=asyncio.get_running_loop())
+    threading.Thread(target=queue.put, args=('threaded',)).start()
+    return [await queue.get(timeout=5), await queue.get(timeout=5)]
+
+  assert asyncio.run(consume()) == ['before', 'threaded']
+  assert queue.qsize() == 0
+
+def test_async_coordinator_accept(client):
+  for starter in ['accept', 'accept_many']:
+    # blocked pops from earlier runs may still be waiting on a fixed key
+    key = f'test_async_coordinator_{starter}:{uuid()}'
+    client.delete(key)
+    client.rpush(key, 'command')
+    coordinator = QuittingCoordinator(config=environment, interactive=False, should_define=False)
+    coordinator.connect()
+    # listeners started before the loop exists must feed the queue the loop reads
+    coordinator.listener_starters[starter](key)
+    run_until_quit(coordinator=coordinator)
+    assert coordinator.ran == ['command']
+
+def test_async_coordinator_listener_tasks(client):
+  key = f'test_async_coordinator_listener_tasks:{uuid()}'
+  channel = f'test_async_coordinator_listener_tasks:{uuid()}'
+  for starter, args in [('accept_many', [f'{key}:high', f'{key}:low']), ('subscribe', [f'{channel}*']), ('consume', [key, 'group'])]:
+    coordinator = StreamCoordinator(config=environment, interactive=False, should_define=False)
+    coordinator.connect()
+    coordinator.listener_starters[starter](*args)
+    thread = threading.Thread(target=coordinator.start, daemon=True)
+    thread.start()
+    if starter == 'accept_many':
+      client.rpush(f'{key}:low', 'command')
+    elif starter == 'subscribe':
+      deadline = time.monotonic() + 5
+      while client.publish(channel, 'command') != 1:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    else:
+      client.xadd(key, {'command': 'command'})
+    thread.join(10)
+    assert not thread.is_alive()
+    assert coordinator.ran == ['command']
+    # listeners run as tasks on the loop rather than on threads of their own
+    assert all(isinstance(f, asyncio.Task) for f in coordinator.listeners.values())
+
+def test_async_coordinator_serial_commands():
+  class SlowCoordinator(QuittingCoordinator):
+    ticks = 0
+
+    def run_command(self, command: str):
+      if command == 'slow':
+        self.command_thread = threading.current_thread().name
+        start_ticks = self.ticks
+        time.sleep(0.3)
+        self.ticks_during_command = self.ticks - start_ticks
+        return
+      super().run_command(command=command)
+
+  async def tick():
+    while True:
+      coordinator.ticks += 1
+      await asyncio.sleep(0.01)
+
+  coordinator = SlowCoordinator(config={}, interactive=False, should_define=False)
+  coordinator.start_listener(Listener(runner=tick, name='tick'))
+  coordinator.commands_to_run = ['slow', 'quit']
+  run_until_quit(coordinator=coordinator)
+  assert coordinator.ran == ['quit']
+  # without workers nothing runs concurrently, but a slow command does not stall listener tasks
+  assert coordinator._executor is None
+  assert coordinator.command_thread.startswith('micra_serial_command')
+  assert coordinator.ticks_during_command > 5
+
+def test_async_run_subprocess():
+  coordinator = AsyncCoordinator(config={}, interactive=False, should_define=False)
+
+  async def run():
+    try:
+      await coordinator.run_subprocess(run_args=['sh', '-c', 'exit 3'])
+    except MicraSubprocessEnded as e:
+      return e
+  assert isinstance(asyncio.run(run()), MicraSubprocessEnded)
+  commands = [coordinator.queue.get_nowait() for _ in range(2)]
+  assert commands[1].endswith(' clear')
+  exits = [s for s in coordinator.status_items if s.startswith('Subprocess exited:')]
+  # the exit keeps the resource usage that the sync coordinator reports
+  assert len(exits) == 1 and ' code 3, cpu ' in exits[0] and 'max rss ' in exits[0]
@@ -0,0 +1,16 @@
+from redis import SSLConnection, UnixDomainSocketConnection
+from ..connection import ConnectionPools
+
+def test_connection_pools():
+  pools = ConnectionPools(redis_config={'host': 'localhost', 'ssl': True, 'ssl_cert_reqs': 'none'}, pools_config={'blocking': {'max_connections': 7}})
+  assert pools.request.connection_class is SSLConnection
+  assert pools.blocking.connection_class is SSLConnection
+  assert pools.blocking.max_connections == 7
+  assert 'ssl' not in pools.request.connection_kwargs
+  pools = ConnectionPools(redis_config={'unix_socket_path': '/tmp/redis.sock', 'port': 6379, 'single_connection_client': True})
+  assert pools.request.connection_class is UnixDomainSocketConnection
+  assert pools.request.connection_kwargs['path'] == '/tmp/redis.sock'
+  assert 'port' not in pools.request.connection_kwargs
+  assert 'socket_keepalive' not in pools.request.connection_kwargs
+  pools.request.make_connection()
+  assert ConnectionPools.pool_usage(pool=pools.blocking)['in_use'] == 0
@@ -0,0 +1,185 @@
+import time
+import pytest
+
+from environments import environment
+from typing import Callable, List
+from ..base import uuid
+from ..coordinator import Coordinator, Listener, QueuedCommand
+from ..error import MicraSubprocessEnded
+from ..command.coordinator_commands import StatusCommand, QuitCommand
+from .base import client
+
+class RemovingCoordinator(Coordinator):
+  @classmethod
+  def listener_status(cls, listener, thread):
+    # the run loop may remove listeners while a worker renders status
+    coordinator.listeners.clear()
+    return super().listener_status(listener=listener, thread=thread)
+
+coordinator = None
+
+def test_can_run_concurrently():
+  command = StatusCommand(context=Coordinator(config={}, interactive=False, should_define=False))
+  assert command.can_run_concurrently(command='status')
+  assert command.can_run_concurrently(command='status -f json')
+  for spelling in ['status -f dataframe', 'status -fdataframe', 'status --format dataframe', 'status --format=dataframe']:
+    assert not command.can_run_concurrently(command=spelling)
+  assert not QuitCommand(context=command.context).can_run_concurrently(command='quit')
+
+def test_status_items_snapshot_listeners():
+  global coordinator
+  coordinator = RemovingCoordinator(config={}, interactive=False, should_define=False)
+  listeners = [Listener(runner=lambda: None, name=f'listener_{i}') for i in range(3)]
+  for listener in listeners:
+    coordinator.start_listener(listener)
+  status = coordinator.status_items
+  assert [s.split(' ')[1] for s in status] == [l.name for l in listeners]
+
+class StreamCoordinator(Coordinator):
+  def __init__(self, *args, **kwargs):
+    super().__init__(*args, **kwargs)
+    self.deliveries = []
+
+  def handle_stream_entries(self, key, group, entries):
+    # leave entries marked retry pending on their first delivery so that they are claimed again
+    self.deliveries += [text(i) for i, _ in entries]
+    return [i for i, f in entries if not {text(k): text(v) for k, v in f.items()}.get('retry') or self.deliveries.count(text(i)) > 1]
+
+def text(value: any) -> any:
+  return value.decode() if isinstance(value, bytes) else value
+
+def wait_for(condition: Callable[[], bool], timeout: float=5):
+  deadline = time.monotonic() + timeout
+  while not condition():
+    assert time.monotonic() < deadline
+    time.sleep(0.01)
+
+def connected_coordinator(coordinator_type: type=Coordinator, **config) -> Coordinator:
+  coordinator = coordinator_type(config={**environment, **config}, interactive=False, should_define=False)
+  coordinator.connect()
+  return coordinator
+
+def queued_commands(coordinator: Coordinator, count: int) -> List[QueuedCommand]:
+  return [coordinator.queue.get(timeout=5) for _ in range(count)]
+
+def stop_listeners(coordinator: Coordinator):
+  for listener, thread in list(coordinator.listeners.items()):
+    listener.stop()
+    thread.join(5)
+
+def test_accept_prefetch(client):
+  key = f'test_accept_prefetch:{uuid()}'
+  for i in range(5):
+    client.lpush(key, f'command_{i}')
+  coordinator = connected_coordinator()
+  coordinator.start_accept_commands(key=key, prefetch=3)
+  # the first pop blocks and the rest of the window is filled in one batch
+  commands = queued_commands(coordinator=coordinator, count=3)
+  assert [text(c.command) for c in commands] == ['command_0', 'command_1', 'command_2']
+  time.sleep(0.2)
+  assert coordinator.queue.empty()
+  assert client.llen(key) == 2
+  # running a command frees one slot in the window
+  commands[0].acknowledge()
+  assert [text(c.command) for c in queued_commands(coordinator=coordinator, count=1)] == ['command_3']
+  assert client.llen(key) == 1
+
+def test_accept_processing_key(client):
+  key = f'test_accept_processing_key:{uuid()}'
+  processing_key = f'{key}:processing'
+  # a command that an earlier run accepted but never acknowledged
+  client.lpush(processing_key, 'unacknowledged')
+  client.lpush(key, 'new')
+  coordinator = connected_coordinator(accept={'processing_key': processing_key})
+  coordinator.start_accept_commands(key=key, prefetch=2)
+  commands = queued_commands(coordinator=coordinator, count=2)
+  assert [text(c.command) for c in commands] == ['unacknowledged', 'new']
+  assert client.llen(key) == 0
+  assert sorted(text(c) for c in client.lrange(processing_key, 0, -1)) == ['new', 'unacknowledged']
+  commands[0].acknowledge()
+  assert [text(c) for c in client.lrange(processing_key, 0, -1)] == ['new']
+
+def test_accept_many_priority(client):
+  high_key, low_key = [f'test_accept_many_priority:{p}:{uuid()}' for p in ['high', 'low']]
+  client.lpush(low_key, 'low_0', 'low_1')
+  client.lpush(high_key, 'high_0')
+  coordinator = connected_coordinator()
+  coordinator.start_accept_many_commands(keys=[high_key, low_key], prefetch=3)
+  commands = queued_commands(coordinator=coordinator, count=3)
+  assert [text(c.command) for c in commands] == ['high_0', 'low_0', 'low_1']
+  listener = next(iter(coordinator.listeners))
+  # the counts are reported after the batch is queued
+  wait_for(lambda: listener.get_info().get(f'{low_key} dequeued') == 2)
+  assert listener.output_queue.empty()
+  with pytest.raises(ValueError):
+    coordinator.start_accept_many_commands(keys=[high_key, low_key], processing_key=f'{high_key}:processing')
+
+def test_consume_starter():
+  assert 'consume' not in Coordinator(config={}, interactive=False, should_define=False).listener_starters
+  assert 'consume' in StreamCoordinator(config={}, interactive=False, should_define=False).listener_starters
+
+def test_consume_stream(client):
+  key = f'test_consume_stream:{uuid()}'
+  group = 'group'
+  ids = [text(client.xadd(key, f)) for f in [{'n': 0}, {'n': 1, 'retry': 1}, {'n': 2}]]
+  coordinator = connected_coordinator(coordinator_type=StreamCoordinator, consume={'block_ms': 50, 'claim_idle_ms': 100, 'claim_interval': 0})
+  coordinator.start_consume_stream(key=key, group=group, consumer='consumer')
+  # the entry left pending is claimed once it has been idle long enough and acknowledged then
+  wait_for(lambda: coordinator.deliveries.count(ids[1]) == 2)
+  wait_for(lambda: client.xpending(key, group)['pending'] == 0)
+  stop_listeners(coordinator=coordinator)
+  assert sorted(coordinator.deliveries) == sorted(ids + [ids[1]])
+  listener = next(iter(coordinator.listeners))
+  # progress replaces the listener info instead of queueing an update per read
+  assert listener.output_queue.empty()
+  info = listener.get_info()
+  assert info['consumed'] == 4 and info['acknowledged'] == 3 and info['claimed'] == 1
+
+def test_consume_stream_trim(client):
+  key = f'test_consume_stream_trim:{uuid()}'
+  pipe = client.pipeline()
+  for i in range(250):
+    pipe.xadd(key, {'n': i})
+  pipe.execute()
+  coordinator = connected_coordinator(coordinator_type=StreamCoordinator, consume={'block_ms': 50, 'claim_idle_ms': 0, 'max_length': 10, 'trim_interval': 0})
+  coordinator.start_consume_stream(key=key, group='group', consumer='consumer')
+  # trimming is approximate, so the server may keep whole nodes beyond the maximum length
+  wait_for(lambda: client.xlen(key) < 250)
+  stop_listeners(coordinator=coordinator)
+  assert client.xlen(key) >= 10
+
+def test_subscribe_drops(client):
+  channel = f'test_subscribe_drops:{uuid()}'
+  coordinator = connected_coordinator(subscribe={'max_pending': 2})
+  coordinator.start_subscribe_commands(patterns=[f'{channel}*'])
+  wait_for(lambda: client.publish(channel, 'probe') == 1)
+  queued_commands(coordinator=coordinator, count=1)
+  pipe = client.pipeline()
+  for i in range(5):
+    pipe.publish(channel, f'command_{i}')
+  pipe.execute()
+  listener = next(iter(coordinator.listeners))
+  # commands beyond the pending limit are dropped rather than queued without bound
+  wait_for(lambda: listener.get_info()['received'] == 6)
+  stop_listeners(coordinator=coordinator)
+  info = listener.get_info()
+  assert info['dropped'] == 3
+  assert 1 <= info['last_batch'] <= 5
+  assert listener.output_queue.empty()
+  assert [text(c) for c in queued_commands(coordinator=coordinator, count=2)] == ['command_0', 'command_1']
+  assert coordinator.queue.empty()
+
+def test_start_subprocess():
+  coordinator = Coordinator(config={}, interactive=False, should_define=False)
+  start = time.monotonic()
+  with pytest.raises(MicraSubprocessEnded):
+    coordinator.start_subprocess(run_args=['sh', '-c', 'exit 3'])
+  # the exit is reaped as it happens rather than noticed by a poll
+  assert time.monotonic() - start < 0.5
+  set_command, clear_command = [coordinator.queue.get_nowait() for _ in range(2)]
+  pid = int(set_command.split(' ')[1])
+  assert set_command.startswith(f'subprocess {pid} set ')
+  assert clear_command == f'subprocess {pid} clear'
+  exits = [s for s in coordinator.status_items if s.startswith('Subprocess exited:')]
+  assert len(exits) == 1
+  assert f'({pid}) code 3, cpu ' in exits[0] and 'max rss ' in exits[0]
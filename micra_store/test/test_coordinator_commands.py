@@ -0,0 +1,57 @@
+import json
+import time
+
+from environments import environment
+from ..base import uuid
+from ..coordinator import Coordinator
+from ..command.coordinator_commands import ViewCommand
+from ..structure import List, json_type, micra_content_types, micra_structures, definition_registry
+from .base import client
+
+def test_view_stream(client, capsys):
+  identifier = f'test_view_stream_{uuid()}'
+  structure = List(
+    identifier=identifier,
+    title='Test View Stream',
+    description='A list read in pages.',
+    key=f'test_view_stream:{uuid()}',
+    content_type=json_type.identifier
+  )
+  channel = f'test_view_stream:{uuid()}'
+  coordinator = Coordinator(config=environment, interactive=False, should_define=False)
+  coordinator.connect()
+  defines_json_type = client.hget(micra_content_types.key, json_type.identifier) is None
+  if defines_json_type:
+    coordinator.define_structure(element=json_type)
+  coordinator.define_structure(element=structure)
+  pubsub = client.pubsub(ignore_subscribe_messages=True)
+  try:
+    client.rpush(structure.key, *[json.dumps({'n': i}) for i in range(5)])
+    pubsub.subscribe(channel)
+    command = ViewCommand(context=coordinator)
+    outputs = {}
+    for format in ['json', 'csv']:
+      capsys.readouterr()
+      command.run(command=f'view -s {identifier} --page-size 2 --stream -f {format} -p {channel} -e')
+      printed = [l for l in capsys.readouterr().out.splitlines() if not l.startswith('Sent response')]
+      published = []
+      deadline = time.monotonic() + 5
+      while len(published) < 3 and time.monotonic() < deadline:
+        message = pubsub.get_message(timeout=0.1)
+        if message is not None:
+          published.append(message['data'].decode() if isinstance(message['data'], bytes) else message['data'])
+      # each page of two members is emitted as its own chunk
+      assert len(published) == 3
+      assert '\n'.join(published).splitlines() == printed
+      outputs[format] = printed
+    assert [json.loads(l)['json']['n'] for l in outputs['json']] == [0, 1, 2, 3, 4]
+    assert len(outputs['csv']) == 6
+    assert outputs['csv'][0].startswith(',key,')
+    assert not any(l.startswith(',key,') for l in outputs['csv'][1:])
+  finally:
+    pubsub.close()
+    client.delete(structure.key)
+    client.hdel(micra_structures.key, identifier)
+    if defines_json_type:
+      client.hdel(micra_content_types.key, json_type.identifier)
+    definition_registry.bump_version(redis=client)
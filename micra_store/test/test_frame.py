@@ -0,0 +1,13 @@
+import pandas as pd
+
+from ..frame import FrameAccumulator
+
+def test_frame_accumulator():
+  accumulator = FrameAccumulator(frames=[pd.DataFrame(), pd.DataFrame([{'a': 1}])])
+  accumulator.add_records([{'a': 2, 'b': 'x'}])
+  accumulator.add(pd.DataFrame(columns=['c']))
+  df = accumulator.frame()
+  assert len(accumulator) == 2
+  assert list(df.columns) == ['a', 'b', 'c']
+  assert list(df['a']) == [1, 2]
+  assert FrameAccumulator().frame().empty
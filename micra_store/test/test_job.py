@@ -0,0 +1,24 @@
+from ..base import uuid
+from ..job import score_jobs, dispatch_jobs, finish_job
+from .base import client
+
+def test_job_transitions(client):
+  # unique keys keep the test away from the job queues of the environment
+  prefix = f'test_job_transitions:{uuid()}'
+  names = [f'{prefix}:job:0', f'{prefix}:job:1']
+  scored_key, ready_key, active_key, stream_key = [f'{prefix}:{k}' for k in ['scored', 'ready', 'active', 'stream']]
+  try:
+    assert score_jobs(client, {names[0]: 1, names[1]: 2}, scored_key=scored_key, active_key=active_key) == 2
+    assert client.scard(active_key) == 2
+    dispatched = dispatch_jobs(client, count=1, scored_key=scored_key, ready_key=ready_key, active_key=active_key, stream_key=stream_key)
+    assert [n.decode() if isinstance(n, bytes) else n for n in dispatched] == [names[1]]
+    assert client.zcard(scored_key) == 1
+    assert client.sismember(ready_key, names[1])
+    assert client.xlen(stream_key) == 1
+    # read the raw field so that the test holds whether or not the client decodes responses
+    assert client.hget(names[1], 'ran') is not None
+    assert client.hget(names[0], 'ran') is None
+    assert finish_job(client, names[1], result='ok', ready_key=ready_key, active_key=active_key)
+    assert not client.sismember(active_key, names[1])
+  finally:
+    client.delete(scored_key, ready_key, active_key, stream_key, *names)
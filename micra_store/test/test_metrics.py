@@ -0,0 +1,27 @@
+from ..metrics import Histogram, MetricsRegistry
+
+def test_histogram():
+  histogram = Histogram()
+  for value in range(1, 1001):
+    histogram.record(value / 1000)
+  assert histogram.count == 1000
+  assert histogram.max == 1
+  # percentiles are bucket bounds within the sub-bucket precision
+  assert abs(histogram.percentile(50) - 0.5) <= 0.5 / 16
+  assert abs(histogram.percentile(99) - 0.99) <= 0.99 / 16
+  assert histogram.percentile(100) == 1
+
+def test_metrics_registry():
+  registry = MetricsRegistry()
+  registry.counter('dequeued_total', key='a').increment(2)
+  registry.gauge('pending').set(3)
+  with registry.timer('command_seconds', command='view'):
+    pass
+  assert registry.counter('dequeued_total', key='a').value == 2
+  snapshot = {m['name']: m for m in registry.snapshot()}
+  assert snapshot['command_seconds']['count'] == 1
+  assert snapshot['command_seconds']['labels'] == {'command': 'view'}
+  text = registry.prometheus_text()
+  assert '# TYPE micra_dequeued_total counter' in text
+  assert 'micra_dequeued_total{key="a"} 2' in text
+  assert 'micra_command_seconds_bucket{command="view",le="+Inf"} 1' in text
@@ -0,0 +1,52 @@
+import os
+import time
+import threading
+
+from ..profile import profiled, profilers
+
+def busy(seconds: float):
+  end = time.perf_counter() + seconds
+  while time.perf_counter() < end:
+    pass
+
+def test_profiled(tmp_path):
+  for mode in profilers:
+    with profiled(directory=str(tmp_path), label='view -s test', mode=mode) as profiler:
+      busy(0.05)
+    assert profiler.top_frames(limit=5)
+  names = sorted(os.listdir(tmp_path))
+  assert len(names) == 2
+  assert names[0].startswith('view_-s_test-')
+  assert {os.path.splitext(n)[1] for n in names} == {'.pstats', '.collapsed'}
+
+def test_profiled_nested(tmp_path):
+  with profiled(directory=str(tmp_path), label='outer') as outer:
+    with profiled(directory=str(tmp_path), label='inner') as inner:
+      busy(0.01)
+  assert inner is outer
+  assert [n.split('-')[0] for n in os.listdir(tmp_path)] == ['outer']
+
+def test_profiled_threads(tmp_path):
+  # profiles started on several workers run one after another instead of overlapping
+  spans = []
+
+  def worker(index: int):
+    with profiled(directory=str(tmp_path), label=f'worker_{index}'):
+      start = time.monotonic()
+      busy(0.02)
+      spans.append((start, time.monotonic()))
+
+  threads = [threading.Thread(target=worker, args=(i,)) for i in range(3)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  spans.sort()
+  assert all(a[1] <= b[0] for a, b in zip(spans, spans[1:]))
+  assert len(os.listdir(tmp_path)) == 3
+
+def test_profiled_repeated_label(tmp_path):
+  for _ in range(3):
+    with profiled(directory=str(tmp_path), label='view'):
+      busy(0.001)
+  assert len(os.listdir(tmp_path)) == 3
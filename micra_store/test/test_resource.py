@@ -1,3 +1,5 @@
+import json
+
 from ..resource import Resource
 from ..job import Job
 from .base import client
@@ -20,3 +22,69 @@ def test_job(client):
   j._get(client)
   j.realm = 'almacen_api'
   j._put(client, {'realm': 'almacen'})
+
+def test_resource_changes():
+  r = Resource(name='test_resource', contents={'a': '1', 'b': '2'})
+  assert r._changes == ({'a': '1', 'b': '2'}, [])
+  r._mark_clean()
+  r.a = '3'
+  r._set_key(key='b', value=None, optional=True)
+  r.c = '4'
+  assert r._changes == ({'a': '3', 'c': '4'}, ['b'])
+  assert r._put_script_args(check_map={'a': '1'}) == [1, 2, 1, 0, 'a', '1', 'a', '3', 'c', '4', 'b']
+
+def test_resource_loaded_changes():
+  loaded = {'a': '1', 'b': '2'}
+  r = Resource(name='test_resource')._load(contents=loaded)
+  assert r._changes == ({}, [])
+  r.a = '3'
+  assert loaded == {'a': '1', 'b': '2'}
+  assert r._changes == ({'a': '3'}, [])
+  r._mark_clean()
+  r._set_key(key='b', value=None, optional=True)
+  assert r._changes == ({}, ['b'])
+
+def test_job_many(client):
+  names = ['test_job_many:0', 'test_job_many:1']
+  client.delete(*names)
+  jobs = Job.get_many(client, names)
+  for job in jobs:
+    job.realm = 'almacen'
+  assert Job.put_many(client, jobs) == [True, True]
+  for job in jobs:
+    job.realm = 'almacen_api'
+  assert Job.put_many(client, jobs, check_maps=[{'realm': 'almacen'}, {'realm': 'other'}]) == [True, False]
+  # read the raw field so that the test holds whether or not the client decodes responses
+  realms = [client.hget(n, 'realm') for n in names]
+  assert [r.decode() if isinstance(r, bytes) else r for r in realms] == ['almacen_api', 'almacen']
+  client.delete(*names)
+
+def test_job_fields():
+  j = Job(name='test_job', contents={'configuration': '{"a": 1}', 'created': '2020-01-01T00:00:00'})
+  assert j.configuration == {'a': 1}
+  assert j.configuration is j.configuration
+  j.configuration = [1]
+  assert j._contents['configuration'] == '[1]'
+  assert j.created.year == 2020
+  j.result = None
+  assert j.result is None
+  try:
+    j.source = 'test'
+    assert False
+  except AttributeError:
+    pass
+
+def test_job_field_mutation(client):
+  name = 'test_job_field_mutation'
+  client.delete(name)
+  client.hset(name, mapping={'configuration': '{"a": 1}'})
+  # loaded from str contents so that the test holds whether or not the client decodes responses
+  j = Job(name=name)._load(contents={'configuration': '{"a": 1}'})
+  assert j._changes == ({}, [])
+  # changes made in place to a decoded value are written like assignments
+  j.configuration['b'] = 2
+  assert j._changes == ({'configuration': '{"a": 1, "b": 2}'}, [])
+  assert j._put(client)
+  assert json.loads(client.hget(name, 'configuration')) == {'a': 1, 'b': 2}
+  assert j._changes == ({}, [])
+  client.delete(name)
@@ -1,7 +1,9 @@
 import json
+import pandas as pd
 
 from collections import OrderedDict
-from ..structure import ordered_representation
+from ..structure import ordered_representation, range_indices, json_type, micra_content_types, micra_structures, definitions_version_key, ContentType, DefinitionRegistry, StructureType, ContentConverter, RecordColumns, Structure, Hash, List, Stream, Join, json_decoders
+from .base import client
 
 def test_ordered_representation():
   d = {
@@ -13,3 +15,168 @@ def test_ordered_representation():
     ('e', 'f'),
   ])
   assert json.dumps(ordered_representation(d)) == json.dumps(ordered_d)
+
+def test_join_key_on(client):
+  structure = List(
+    identifier='test_join_key_on',
+    title='Test Join Key On',
+    description='A list per token.',
+    key='test_join_key_on:{}',
+    content_type=json_type.identifier,
+    key_tokens=['id']
+  )
+  previous_json_type = client.hget(micra_content_types.key, json_type.identifier)
+  client.hset(micra_content_types.key, json_type.identifier, json.dumps(json_type.ordered_structure_dict))
+  client.hset(micra_structures.key, structure.identifier, json.dumps(structure.ordered_structure_dict))
+  try:
+    client.delete('test_join_key_on:a', 'test_join_key_on:b')
+    client.rpush('test_join_key_on:a', '1', '2')
+    client.rpush('test_join_key_on:b', '3')
+    df = pd.DataFrame([{'id': 'a'}, {'id': 'b'}, {'id': 'a'}])
+    joined = Join(structure=structure.identifier, key_on=['id']).join(data_frame=df, redis=client)
+    assert sorted(joined['json'].dropna()) == [1, 2, 3]
+    assert set(joined['key'].dropna()) == {'test_join_key_on:a', 'test_join_key_on:b'}
+  finally:
+    # the definition hashes are shared with whatever coordinator uses this Redis
+    client.delete('test_join_key_on:a', 'test_join_key_on:b')
+    client.hdel(micra_structures.key, structure.identifier)
+    if previous_json_type is None:
+      client.hdel(micra_content_types.key, json_type.identifier)
+    else:
+      client.hset(micra_content_types.key, json_type.identifier, previous_json_type)
+
+def test_definition_registry(client):
+  registry = DefinitionRegistry(check_interval=0)
+  renamed_type = ContentType(
+    identifier=json_type.identifier,
+    title='Renamed JSON',
+    description=json_type.description,
+    converter=json_type.converter
+  )
+  previous_json_type = client.hget(micra_content_types.key, json_type.identifier)
+  try:
+    client.hset(micra_content_types.key, json_type.identifier, json.dumps(json_type.ordered_structure_dict))
+    client.incr(definitions_version_key)
+    assert registry.get_content_type(identifier=json_type.identifier, redis=client).title == json_type.title
+    client.hset(micra_content_types.key, json_type.identifier, json.dumps(renamed_type.ordered_structure_dict))
+    assert registry.get_content_type(identifier=json_type.identifier, redis=client).title == json_type.title
+    client.incr(definitions_version_key)
+    assert registry.get_content_type(identifier=json_type.identifier, redis=client).title == renamed_type.title
+  finally:
+    # leave the shared definition as it was even when an assertion fails
+    if previous_json_type is None:
+      client.hdel(micra_content_types.key, json_type.identifier)
+    else:
+      client.hset(micra_content_types.key, json_type.identifier, previous_json_type)
+    client.incr(definitions_version_key)
+
+def test_iterate_content(client):
+  key = 'test_iterate_content'
+  client.delete(key)
+  client.rpush(key, *map(str, range(5)))
+  pages = list(StructureType.list.iterate_content(key=key, redis=client, page_size=2))
+  assert [len(p) for p in pages] == [2, 2, 1]
+  client.delete(key)
+  client.hset(key, mapping={str(i): str(i) for i in range(5)})
+  pages = list(StructureType.hash.iterate_content(key=key, redis=client, page_size=2))
+  assert sum(len(p) for p in pages) == 5
+  client.delete(key)
+  client.zadd(key, {str(i): i for i in [100, 0, 10, 1, 1000]})
+  pages = list(StructureType.ordered_set.iterate_content(key=key, redis=client, page_size=2))
+  assert [s for p in pages for _, s in p] == [0, 1, 10, 100, 1000]
+  client.delete(key)
+  for i in range(5):
+    client.xadd(key, {'i': i})
+  pages = list(StructureType.stream.iterate_content(key=key, redis=client, page_size=2))
+  assert [len(p[0][1]) for p in pages] == [2, 2, 1]
+  records = [r for p in pages for r in StructureType.stream.convert_to_records(content=p, converter=ContentConverter.dictionary)]
+  assert len(records) == 5
+  client.delete(key)
+
+def test_range_indices():
+  assert range_indices(length=5, ranges=[(1, 2)]) == [1, 2]
+  assert range_indices(length=5, ranges=[(None, 0), (-2, None)]) == [0, 3, 4]
+  assert range_indices(length=5, ranges=[(-10, 10)]) == [0, 1, 2, 3, 4]
+  assert range_indices(length=5, ranges=[(4, 1)]) == []
+
+def test_content_range(client):
+  key = 'test_content_range'
+  client.delete(key)
+  client.zadd(key, {str(i): i for i in range(10)})
+  content = StructureType.ordered_set.get_content_range(key=key, redis=client, start=-3, stop=-1)
+  assert [s for _, s in content] == [7, 8, 9]
+  client.delete(key)
+
+def test_get_displays(client):
+  stream = Stream(
+    identifier='test_get_displays_stream',
+    title='Test Get Displays Stream',
+    description='A stream.',
+    key='test_get_displays_stream',
+    content_type=json_type.identifier
+  )
+  structure = List(
+    identifier='test_get_displays_list',
+    title='Test Get Displays List',
+    description='A list.',
+    key='test_get_displays_list',
+    content_type=json_type.identifier
+  )
+  client.delete(stream.key, structure.key)
+  for i in range(5):
+    client.xadd(stream.key, {'i': i})
+  client.rpush(structure.key, *map(str, range(5)))
+  structures = [stream.with_content_range(content_range=(1, 2)), structure.with_content_range(content_range=(1, 2))]
+  displays = Structure.get_displays(structures=structures, redis=client)
+  assert [m for m, _ in displays] == ['(length: 5)', '(length: 5)']
+  assert displays[0][1] == structures[0].format_detail(content=structures[0].get_display_content(redis=client))
+  assert displays[1][1] == structures[1].format_detail(content=client.lrange(structure.key, 1, 2))
+  stream_content = structures[0].get_display_content(redis=client)
+  assert len(stream_content[0][1]) == 2
+  client.delete(stream.key, structure.key)
+
+def test_get_displays_unordered_range(client):
+  structure = Hash(
+    identifier='test_get_displays_hash',
+    title='Test Get Displays Hash',
+    description='A hash.',
+    key='test_get_displays_hash',
+    content_type=json_type.identifier
+  )
+  client.delete(structure.key)
+  client.hset(structure.key, mapping={f'field_{i}': str(i) for i in range(20)})
+  # hashes cannot push a range down to Redis, so the string display slices the full reply
+  for content_range, length in [((0, 2), 3), ((-2, None), 2)]:
+    ranged = structure.with_content_range(content_range=content_range)
+    content = ranged.get_display_content(redis=client)
+    assert len(content) == length
+    assert Structure.get_displays(structures=[ranged], redis=client)[0][1] == ranged.format_detail(content=content)
+  stream = Stream(
+    identifier='test_get_displays_hash_stream',
+    title='Test Get Displays Hash Stream',
+    description='A stream.',
+    key='test_get_displays_hash_stream',
+    content_type=json_type.identifier
+  )
+  client.delete(stream.key)
+  for i in range(5):
+    client.xadd(stream.key, {'i': i})
+  content = stream.with_content_range(content_range=(-2, None)).get_display_content(redis=client)
+  assert [int(v) for _, f in content[0][1] for v in f.values()] == [3, 4]
+  client.delete(structure.key, stream.key)
+
+def test_record_columns():
+  columns = RecordColumns(identifier='test')
+  StructureType.hash.convert_to_columns(content={'a': '{"x": 1}', 'b': '{"y": 2}'}, converter=ContentConverter.json_object, columns=columns)
+  StructureType.hash.convert_to_columns(content={'c': '{"x": 3, "z": 4}'}, converter=ContentConverter.json_object, columns=columns)
+  df = columns.data_frame()
+  assert list(df.columns) == ['hash_key', 'test.x', 'test.y', 'test.z']
+  assert list(df['hash_key']) == ['a', 'b', 'c']
+  assert list(df['test.x'].fillna(0)) == [1, 0, 3]
+
+def test_json_decoders():
+  serializations = [b'1', '"a"', b'{"b": [1, 2.5, null]}', b'NaN']
+  for decoder in json_decoders.values():
+    decoded = decoder.loads_many(serializations)
+    assert decoded[:3] == [1, 'a', {'b': [1, 2.5, None]}]
+    assert decoded[3] != decoded[3]
@@ -0,0 +1,20 @@
+from ..job import Job
+from ..table import JobTable
+
+def test_job_table():
+  jobs = [
+    Job(name='test_job:0', contents={'realm': 'almacen', 'configuration': '{"a": 1}'}),
+    Job(name='test_job:1', contents={'realm': 'almacen_api', 'result': 'ok'}),
+  ]
+  table = JobTable.from_resources(jobs)
+  assert len(table) == 2
+  assert table.column('result') == [None, 'ok']
+  assert table.decoded_column('configuration') == [{'a': 1}, None]
+  df = table.to_data_frame()
+  assert list(df.index) == ['test_job:0', 'test_job:1']
+  round_trip = JobTable.from_data_frame(df)
+  assert round_trip[1]._contents == jobs[1]._contents
+  round_trip.append(Job(name='test_job:2', contents={'host': 'h'}))
+  assert round_trip[2].host == 'h'
+  assert round_trip[0].host is None
+  assert not hasattr(jobs[0], '__dict__')
@@ -4,6 +4,7 @@ from typing import Optional, List, Any as any
 from environments import set_environment, environment
 from .coordinator import Coordinator
 from .command import Command
+from .profile import profilers, CProfileProfiler
 
 class MicraCommandGroup(click.MultiCommand):
   _micra_commands: Optional[List[Command[Coordinator]]]=None
@@ -35,8 +36,12 @@ class RunContext:
   interactive: bool
   quiet: bool
   commands: List[str]
+  workers: int
+  profile_directory: Optional[str]
+  profile_mode: str
+  profile_channel: Optional[str]
 
-  def __init__(self, pdb_enabled: bool=False, dry_run: bool=False, should_listen: bool=True, should_define: bool=True, interactive: bool=True, quiet: bool=False, environment_name: Optional[str]=None, commands: List[str]=[]):
+  def __init__(self, pdb_enabled: bool=False, dry_run: bool=False, should_listen: bool=True, should_define: bool=True, interactive: bool=True, quiet: bool=False, environment_name: Optional[str]=None, commands: List[str]=[], workers: int=0, profile_directory: Optional[str]=None, profile_mode: str='cprofile', profile_channel: Optional[str]=None):
     self.pdb_enabled = pdb_enabled
     self.dry_run = dry_run
     self.should_listen = should_listen
@@ -45,6 +50,10 @@ class RunContext:
     self.quiet = quiet
     self.environment_name = environment_name
     self.commands = [*commands]
+    self.workers = workers
+    self.profile_directory = profile_directory
+    self.profile_mode = profile_mode
+    self.profile_channel = profile_channel
 
   def configure_coordinator(self, coordinator: Coordinator):
     coordinator.pdb_enabled = self.pdb_enabled
@@ -55,6 +64,10 @@ class RunContext:
     coordinator.user.quiet = self.quiet
     coordinator.config = environment
     coordinator.commands_to_run = self.commands
+    coordinator.workers = self.workers
+    coordinator.profile_directory = self.profile_directory
+    coordinator.profile_mode = self.profile_mode
+    coordinator.profile_channel = self.profile_channel
 
 @click.command(cls=MicraCommandGroup)
 @click.option('--pdb/--no-pdb', 'pdb_enabled')
@@ -65,9 +78,13 @@ class RunContext:
 @click.option('-q', '--quiet', 'quiet', is_flag=True)
 @click.option('-e', '--environment', 'environment_name', type=str)
 @click.option('-c', '--command', 'commands', type=str, multiple=True)
+@click.option('-w', '--workers', 'workers', type=click.IntRange(min=0), default=0, help='Run read-only commands on this many worker threads.')
+@click.option('--profile', 'profile_directory', type=click.Path(file_okay=False), help='Profile each command and write the results to this directory.')
+@click.option('--profile-mode', 'profile_mode', type=click.Choice(list(profilers.keys())), default=CProfileProfiler.name, help='Write cProfile pstats or sampled collapsed stacks.')
+@click.option('--profile-channel', 'profile_channel', type=str, help='Publish a summary of the top frames of each profile to this channel.')
 @click.pass_context
-def run(ctx: any, pdb_enabled: bool, dry_run: bool, should_listen: bool, should_define: bool, interactive: bool, quiet: bool, environment_name: Optional[str], commands: List[str]):
-  ctx.obj = RunContext(pdb_enabled=pdb_enabled, dry_run=dry_run, should_listen=should_listen, should_define=should_define, interactive=interactive, quiet=quiet, environment_name=environment_name, commands=commands)
+def run(ctx: any, pdb_enabled: bool, dry_run: bool, should_listen: bool, should_define: bool, interactive: bool, quiet: bool, environment_name: Optional[str], commands: List[str], workers: int, profile_directory: Optional[str], profile_mode: str, profile_channel: Optional[str]):
+  ctx.obj = RunContext(pdb_enabled=pdb_enabled, dry_run=dry_run, should_listen=should_listen, should_define=should_define, interactive=interactive, quiet=quiet, environment_name=environment_name, commands=commands, workers=workers, profile_directory=profile_directory, profile_mode=profile_mode, profile_channel=profile_channel)
   if ctx.obj.environment_name:
     set_environment(identifier=ctx.obj.environment_name)
   micra_subcommand = ctx.command.get_micra_command(name=ctx.invoked_subcommand)
@@ -15,5 +15,8 @@ setup(
     'pytest',
     'ipython',
   ],
+  extras_require={
+    'orjson': ['orjson'],
+  },
   zip_safe=False
 )
\ No newline at end of file